@@ -1,9 +1,30 @@
+from time import perf_counter
+IMPORT_STARTED = perf_counter()  # Start of the startup-time breakdown
+
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # Keep imports and reports free of the banner
 import pygame
 import sys
+import copy
+import csv
+import heapq
+import json
+import math
+import mmap
 import random
+import struct
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import compress
 
-# Initialize Pygame
-pygame.init()
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for BatchLevels
+    np = None
 
 # Constants
 SCREEN_WIDTH = 800
@@ -27,62 +48,250 @@ LIGHT_BLUE = (173, 216, 230)
 DARK_GREEN = (0, 100, 0)
 PURPLE = (200, 0, 200)
 ORANGE = (255, 165, 0)
+MAGENTA = (255, 0, 255)  # Colorkey for transparent cached layers
+
+GRID_CELL_SIZE = 64
+TEXT_CACHE_SIZE = 256
+LEVEL_CACHE_SIZE = 8
+LEVEL_LOAD_STAGES = 3  # Level data, surfaces, fonts
+OVERWORLD_TILE_SIZE = 512  # Side of the cached overworld map tiles
+PROFILE_WINDOW = 300  # Frames kept for the rolling percentiles
+PROFILE_OVERLAY_REFRESH = 30  # Frames between overlay text updates
+
+# Benchmark settings
+BENCH_SEED = 12345
+BENCH_REPEATS = 5
+BENCH_TICKS = 2000
+BENCH_FRAMES = 200
+BENCH_PLATFORM_COUNTS = (10, 100, 1000, 10000)
+BENCH_TOLERANCE = 0.10  # Relative change reported as a regression
+
+# Frame pacing
+PHYSICS_RATE = FPS  # Physics steps per second; must divide FPS
+MAX_CATCH_UP_STEPS = 5  # Physics steps per frame before the game is allowed to slow down
+QUALITY_DROP_LOAD = 0.9  # Smoothed share of the frame budget that turns clouds off
+QUALITY_RESTORE_LOAD = 0.5  # Smoothed share below which they come back
+FRAME_LOAD_SMOOTHING = 0.1
+INTERPOLATE_MAX_DISTANCE = 50  # Moves between steps above this (respawns) are not smoothed
+
+# Batch playthroughs
+PLAYTHROUGH_MAX_TICKS = 60 * FPS  # Give up on a run after a minute of game time
+PLAYTHROUGH_RESULTS = ("completed", "game_over", "timeout")
+
+# Search-based autoplay
+PLAN_STEP_TICKS = 4  # Ticks each planned input is held for
+PLAN_MAX_NODES = 20000  # States expanded before the planner gives up
+PLAN_HOP_TICKS = 30  # Estimated ticks per platform-to-platform jump
+PLAN_WEIGHT = 2  # Heuristic weight; above 1 trades optimality for speed
+
+# pygame.font is not thread-safe and the level loader thread uses it too
+FONT_LOCK = threading.RLock()
+
+def init_display():
+    # Bring up only the video subsystem, on first use. Importing this module
+    # initializes nothing; fonts are initialized by get_font() the same way.
+    if not pygame.display.get_init():
+        pygame.display.init()
+
+@lru_cache(maxsize=None)
+def get_font(name, size):
+    # Each (name, size) font is looked up and loaded only once
+    with FONT_LOCK:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        return pygame.font.SysFont(name, size)
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text, color, size, name=None):
+    # Surfaces are shared between callers: blit them, never draw onto them
+    font = get_font(name, size)
+    with FONT_LOCK:
+        return font.render(text, True, color)
+
+# Input vector bits for one simulation tick
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+
+# Shared sprite surfaces, keyed by (kind, size, color)
+SURFACE_CACHE = {}
+
+def paint_player(size, color):
+    image = pygame.Surface(size)
+    image.fill(color)
+    # Draw a simple Mario-like character
+    pygame.draw.rect(image, color, (0, 0, 30, 50))
+    pygame.draw.rect(image, (255, 200, 150), (5, 5, 20, 15))  # Face
+    pygame.draw.rect(image, color, (0, 20, 30, 10))  # Hat brim
+    pygame.draw.rect(image, BLUE, (0, 30, 30, 20))  # Overalls
+    return image
+
+def paint_platform_tile(size, color):
+    image = pygame.Surface(size)
+    image.fill(color)
+    pygame.draw.line(image, (0, 128, 0), (0, 0), (0, size[1]), 1)
+    pygame.draw.line(image, (0, 128, 0), (0, 0), (size[0], 0), 1)
+    return image
+
+def paint_platform(size, color):
+    # Platforms are tiled from one cached 10x10 texture piece
+    image = pygame.Surface(size)
+    tile = get_surface("platform_tile", (10, 10), color)
+    for x in range(0, size[0], 10):
+        for y in range(0, size[1], 10):
+            image.blit(tile, (x, y))
+    return image
+
+def paint_coin(size, color):
+    image = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.circle(image, color, (7, 7), 7)
+    pygame.draw.circle(image, (200, 200, 0), (7, 7), 5)
+    return image
+
+def paint_enemy(size, color):
+    image = pygame.Surface(size)
+    image.fill(color)
+    # Draw eyes
+    pygame.draw.circle(image, WHITE, (8, 10), 5)
+    pygame.draw.circle(image, WHITE, (22, 10), 5)
+    pygame.draw.circle(image, (0, 0, 0), (8, 10), 2)
+    pygame.draw.circle(image, (0, 0, 0), (22, 10), 2)
+    return image
+
+def paint_goal(size, color):
+    image = pygame.Surface(size)
+    image.fill(color)
+    # Draw flag pole
+    pygame.draw.rect(image, GRAY, (15, 0, 10, 60))
+    # Draw flag
+    pygame.draw.polygon(image, RED, [(25, 10), (25, 30), (40, 20)])
+    return image
+
+SURFACE_PAINTERS = {
+    "player": paint_player,
+    "platform_tile": paint_platform_tile,
+    "platform": paint_platform,
+    "coin": paint_coin,
+    "enemy": paint_enemy,
+    "goal": paint_goal,
+}
+
+def get_surface(kind, size, color):
+    # Paint each distinct sprite image once; every instance shares it, so
+    # like render_text() the result must never be drawn onto
+    key = (kind, size, color)
+    image = SURFACE_CACHE.get(key)
+    if image is None:
+        image = SURFACE_PAINTERS[kind](size, color)
+        if pygame.display.get_surface() is not None:
+            if image.get_flags() & pygame.SRCALPHA:
+                image = image.convert_alpha()
+            else:
+                image = image.convert()
+        SURFACE_CACHE[key] = image
+    return image
+
+class LazySprite(pygame.sprite.Sprite):
+    # Images are only fetched from the surface cache the first time a
+    # sprite is drawn, so a headless simulation never touches a Surface
+    kind = None
+    color = None
+    _image = None
+
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = get_surface(self.kind, self.rect.size, self.color)
+        return self._image
+
+class Player(LazySprite):
+    kind = "player"
+    color = RED
+    # Horizontal world bounds and respawn point; streaming levels move them
+    min_x = 0
+    max_x = SCREEN_WIDTH
+    spawn_x = 100
+    spawn_y = 300
 
-class Player(pygame.sprite.Sprite):
     def __init__(self, x, y):
         super().__init__()
-        self.image = pygame.Surface((30, 50))
-        self.image.fill(RED)
-        # Draw a simple Mario-like character
-        pygame.draw.rect(self.image, RED, (0, 0, 30, 50))
-        pygame.draw.rect(self.image, (255, 200, 150), (5, 5, 20, 15))  # Face
-        pygame.draw.rect(self.image, RED, (0, 20, 30, 10))  # Hat brim
-        pygame.draw.rect(self.image, BLUE, (0, 30, 30, 20))  # Overalls
-        
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
+        self.rect = pygame.Rect(x, y, 30, 50)
         self.vel_x = 0
         self.vel_y = 0
         self.on_ground = False
         self.facing_right = True
         self.lives = 3
         
-    def update(self, platforms):
+    def update(self, platforms, dt=1):
+        # Collisions are swept: platforms are looked up over the whole area
+        # covered by a move and the first edge crossed stops it, so large
+        # velocities or a coarse dt (ticks per step) cannot tunnel through
+        # thin platforms. Platforms the player already overlapped before
+        # the move are resolved against the end position as usual.
+
         # Apply gravity
-        self.vel_y += GRAVITY
+        self.vel_y += GRAVITY * dt
         
         # Move horizontally
-        self.rect.x += self.vel_x
+        start = self.rect.copy()
+        self.rect.x += self.vel_x * dt
         
         # Check for horizontal collisions
-        platform_hits = pygame.sprite.spritecollide(self, platforms, False)
-        for platform in platform_hits:
-            if self.vel_x > 0:  # Moving right
-                self.rect.right = platform.rect.left
-            elif self.vel_x < 0:  # Moving left
-                self.rect.left = platform.rect.right
+        platform_hits = platforms.collide(start.union(self.rect))
+        crossed = None
+        if self.vel_x > 0:  # Moving right
+            crossed = [platform.rect.left for platform in platform_hits if platform.rect.left >= start.right]
+            if crossed:
+                self.rect.right = min(crossed)
+        elif self.vel_x < 0:  # Moving left
+            crossed = [platform.rect.right for platform in platform_hits if platform.rect.right <= start.left]
+            if crossed:
+                self.rect.left = max(crossed)
+        if not crossed:
+            for platform in platform_hits:
+                if not self.rect.colliderect(platform.rect):
+                    continue
+                if self.vel_x > 0:  # Moving right
+                    self.rect.right = platform.rect.left
+                elif self.vel_x < 0:  # Moving left
+                    self.rect.left = platform.rect.right
                 
         # Move vertically
-        self.rect.y += self.vel_y
+        start = self.rect.copy()
+        self.rect.y += self.vel_y * dt
         self.on_ground = False
         
         # Check for vertical collisions
-        platform_hits = pygame.sprite.spritecollide(self, platforms, False)
-        for platform in platform_hits:
-            if self.vel_y > 0:  # Falling
-                self.rect.bottom = platform.rect.top
+        platform_hits = platforms.collide(start.union(self.rect))
+        crossed = None
+        if self.vel_y > 0:  # Falling
+            crossed = [platform.rect.top for platform in platform_hits if platform.rect.top >= start.bottom]
+            if crossed:
+                self.rect.bottom = min(crossed)
                 self.on_ground = True
                 self.vel_y = 0
-            elif self.vel_y < 0:  # Jumping
-                self.rect.top = platform.rect.bottom
+        elif self.vel_y < 0:  # Jumping
+            crossed = [platform.rect.bottom for platform in platform_hits if platform.rect.bottom <= start.top]
+            if crossed:
+                self.rect.top = max(crossed)
                 self.vel_y = 0
+        if not crossed:
+            for platform in platform_hits:
+                if not self.rect.colliderect(platform.rect):
+                    continue
+                if self.vel_y > 0:  # Falling
+                    self.rect.bottom = platform.rect.top
+                    self.on_ground = True
+                    self.vel_y = 0
+                elif self.vel_y < 0:  # Jumping
+                    self.rect.top = platform.rect.bottom
+                    self.vel_y = 0
                 
-        # Keep player on screen
-        if self.rect.left < 0:
-            self.rect.left = 0
-        if self.rect.right > SCREEN_WIDTH:
-            self.rect.right = SCREEN_WIDTH
+        # Keep player inside the world
+        if self.rect.left < self.min_x:
+            self.rect.left = self.min_x
+        if self.rect.right > self.max_x:
+            self.rect.right = self.max_x
             
     def jump(self):
         if self.on_ground:
@@ -100,91 +309,302 @@ class Player(pygame.sprite.Sprite):
         self.vel_x = 0
         
     def reset_position(self):
-        self.rect.x = 100
-        self.rect.y = 300
+        self.rect.x = self.spawn_x
+        self.rect.y = self.spawn_y
         self.vel_x = 0
         self.vel_y = 0
 
-class Platform(pygame.sprite.Sprite):
+    def clone(self):
+        player = Player(self.rect.x, self.rect.y)
+        player.vel_x = self.vel_x
+        player.vel_y = self.vel_y
+        player.on_ground = self.on_ground
+        player.facing_right = self.facing_right
+        player.lives = self.lives
+        return player
+
+class Platform(LazySprite):
+    kind = "platform"
+
     def __init__(self, x, y, width, height, color=GREEN):
         super().__init__()
-        self.image = pygame.Surface((width, height))
-        self.image.fill(color)
-        # Add texture to platform
-        for i in range(0, width, 10):
-            pygame.draw.line(self.image, (0, 128, 0), (i, 0), (i, height), 1)
-        for i in range(0, height, 10):
-            pygame.draw.line(self.image, (0, 128, 0), (0, i), (width, i), 1)
-            
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
+        self.color = color
+        self.rect = pygame.Rect(x, y, width, height)
 
-class Coin(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = pygame.Surface((15, 15), pygame.SRCALPHA)
-        pygame.draw.circle(self.image, YELLOW, (7, 7), 7)
-        pygame.draw.circle(self.image, (200, 200, 0), (7, 7), 5)
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        self.image = pygame.Surface((30, 30))
-        self.image.fill((150, 75, 0))  # Brown color for Goomba
-        # Draw eyes
-        pygame.draw.circle(self.image, WHITE, (8, 10), 5)
-        pygame.draw.circle(self.image, WHITE, (22, 10), 5)
-        pygame.draw.circle(self.image, (0, 0, 0), (8, 10), 2)
-        pygame.draw.circle(self.image, (0, 0, 0), (22, 10), 2)
-        
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-        self.direction = 1  # 1 for right, -1 for left
-        self.speed = 2
-        
-    def update(self, platforms):
-        self.rect.x += self.speed * self.direction
-        
-        # Change direction if hitting a platform edge or wall
-        if self.rect.right >= SCREEN_WIDTH or self.rect.left <= 0:
-            self.direction *= -1
-            
-        # Check if about to fall off a platform
-        test_rect = self.rect.copy()
-        test_rect.x += self.speed * self.direction
-        test_rect.y += 5  # Look a bit below
+COIN_SIZE = (15, 15)
+COIN_COLOR = YELLOW
+ENEMY_SIZE = (30, 30)
+ENEMY_COLOR = (150, 75, 0)  # Brown color for Goomba
+ENEMY_SPEED = 2
+
+def patrol(rect, direction, speed, min_x, max_x, platforms):
+    # Walk an enemy rect one step and return its new direction
+    rect.x += speed * direction
+    
+    # Change direction if hitting a platform edge or wall
+    if rect.right >= max_x or rect.left <= min_x:
+        direction *= -1
         
-        on_platform = False
-        for platform in platforms:
-            if test_rect.colliderect(platform.rect):
-                on_platform = True
-                break
-                
-        if not on_platform:
-            self.direction *= -1
+    # Check if about to fall off a platform
+    test_rect = rect.copy()
+    test_rect.x += speed * direction
+    test_rect.y += 5  # Look a bit below
+    
+    if not platforms.any_collide(test_rect):
+        direction *= -1
+    return direction
+
+class Goal(LazySprite):
+    kind = "goal"
+    color = (255, 215, 0)  # Gold color
 
-class Goal(pygame.sprite.Sprite):
     def __init__(self, x, y):
         super().__init__()
-        self.image = pygame.Surface((40, 60))
-        self.image.fill((255, 215, 0))  # Gold color
-        # Draw flag pole
-        pygame.draw.rect(self.image, GRAY, (15, 0, 10, 60))
-        # Draw flag
-        pygame.draw.polygon(self.image, RED, [(25, 10), (25, 30), (40, 20)])
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
+        self.rect = pygame.Rect(x, y, 40, 60)
+
+class SpatialGrid:
+    # Uniform-grid broadphase. Static sprites are inserted once, moving ones
+    # call move() after changing position. Queries return hits in insertion
+    # order so collision resolution matches iterating the original Group.
+    def __init__(self, sprites=(), cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = {}
+        self.order = {}
+        self.next_order = 0
+        self.tests = 0  # Narrowphase rect tests, read by FrameProfiler
+        for sprite in sprites:
+            self.insert(sprite)
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def cell_bounds(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def insert(self, sprite, order=None):
+        # order overrides the insertion position used to sort query hits
+        if order is not None:
+            self.order[sprite] = order
+            self.next_order = max(self.next_order, order + 1)
+        elif sprite not in self.order:
+            self.order[sprite] = self.next_order
+            self.next_order += 1
+        bounds = self.cell_bounds(sprite.rect)
+        self.bounds[sprite] = bounds
+        x0, y0, x1, y1 = bounds
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self.cells.setdefault((cx, cy), {})[sprite] = None
+
+    def remove(self, sprite):
+        bounds = self.bounds.pop(sprite, None)
+        if bounds is None:
+            return
+        del self.order[sprite]
+        x0, y0, x1, y1 = bounds
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells[(cx, cy)]
+                del cell[sprite]
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def move(self, sprite):
+        # Re-bucket a sprite only when it has crossed into different cells
+        bounds = self.cell_bounds(sprite.rect)
+        if self.bounds.get(sprite) == bounds:
+            return
+        order = self.order.get(sprite)
+        self.remove(sprite)
+        if order is not None:
+            self.order[sprite] = order
+        self.insert(sprite)
+
+    def candidates(self, rect):
+        x0, y0, x1, y1 = self.cell_bounds(rect)
+        if x0 == x1 and y0 == y1:
+            return self.cells.get((x0, y0), ())
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        return found
+
+    def collide(self, rect):
+        candidates = self.candidates(rect)
+        self.tests += len(candidates)
+        hits = [sprite for sprite in candidates if rect.colliderect(sprite.rect)]
+        if len(hits) > 1:
+            hits.sort(key=self.order.__getitem__)
+        return hits
+
+    def any_collide(self, rect):
+        for sprite in self.candidates(rect):
+            self.tests += 1
+            if rect.colliderect(sprite.rect):
+                return True
+        return False
+
+def _store_column(name):
+    # EntityView property reading and writing one EntityStore column
+    def get(self):
+        return getattr(self.store, name)[self.index]
+
+    def set(self, value):
+        getattr(self.store, name)[self.index] = value
+    return property(get, set)
+
+class EntityView:
+    # Sprite-like handle on one EntityStore entry, so collision, drawing and
+    # snapshot code written against sprites keeps working. rect returns a
+    # fresh Rect; assign it back to move the entity.
+    __slots__ = ("store", "index")
+
+    x = _store_column("x")
+    y = _store_column("y")
+    direction = _store_column("direction")
+    speed = _store_column("speed")
+    min_x = _store_column("min_x")
+    max_x = _store_column("max_x")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def kind(self):
+        return self.store.kind
+
+    @property
+    def rect(self):
+        store, i = self.store, self.index
+        return pygame.Rect(store.x[i], store.y[i], store.w[i], store.h[i])
+
+    @rect.setter
+    def rect(self, rect):
+        store, i = self.store, self.index
+        store.x[i], store.y[i], store.w[i], store.h[i] = rect
+
+    @property
+    def image(self):
+        return self.store.image(self.index)
+
+    def alive(self):
+        return bool(self.store.alive_flags[self.index])
+
+    def kill(self):
+        self.store.kill(self.index)
+
+    def revive(self):
+        self.store.revive(self.index)
+
+    def update(self, platforms, dt=1):
+        store, i = self.store, self.index
+        rect = pygame.Rect(store.x[i], store.y[i], store.w[i], store.h[i])
+        store.direction[i] = patrol(rect, store.direction[i], store.speed[i] * dt, store.min_x[i], store.max_x[i],
+                                    platforms)
+        store.x[i] = rect.x
+
+class EntityStore:
+    # Struct-of-arrays storage for one kind of level entity. Position, size,
+    # movement and alive flag live in typed arrays, and images are shared
+    # per (size, color) and referenced by id, so an entity costs a few dozen
+    # bytes instead of a Sprite with its own dict, Rect and Group links.
+    # Iterating yields views of the living entities in creation order, like
+    # the sprite Group it replaces. Released slots are reused by add().
+    def __init__(self, kind):
+        self.kind = kind
+        self.x = array("i")
+        self.y = array("i")
+        self.w = array("i")
+        self.h = array("i")
+        self.direction = array("b")
+        self.speed = array("b")
+        self.min_x = array("i")
+        self.max_x = array("i")
+        self.alive_flags = array("B")
+        self.image_ids = array("H")
+        self.images = []  # (size, color) per image id
+        self.image_index = {}
+        self.views = []
+        self.free = []
+        self.living = 0
+
+    def __len__(self):
+        return self.living
+
+    def __iter__(self):
+        return compress(self.views, self.alive_flags)
+
+    def sprites(self):
+        return list(self)
+
+    def columns(self):
+        return (self.x, self.y, self.w, self.h, self.direction, self.speed,
+                self.min_x, self.max_x, self.alive_flags, self.image_ids)
+
+    def add(self, x, y, width, height, color, direction=1, speed=0, min_x=0, max_x=SCREEN_WIDTH):
+        key = ((width, height), color)
+        image_id = self.image_index.get(key)
+        if image_id is None:
+            image_id = self.image_index[key] = len(self.images)
+            self.images.append(key)
+        values = (x, y, width, height, direction, speed, min_x, max_x, 1, image_id)
+        if self.free:
+            index = self.free.pop()
+            for column, value in zip(self.columns(), values):
+                column[index] = value
+        else:
+            index = len(self.views)
+            for column, value in zip(self.columns(), values):
+                column.append(value)
+            self.views.append(EntityView(self, index))
+        self.living += 1
+        return self.views[index]
+
+    def kill(self, index):
+        if self.alive_flags[index]:
+            self.alive_flags[index] = 0
+            self.living -= 1
+
+    def revive(self, index):
+        if not self.alive_flags[index]:
+            self.alive_flags[index] = 1
+            self.living += 1
+
+    def release(self, index):
+        # Free a slot for reuse; views of it must no longer be held
+        self.kill(index)
+        self.free.append(index)
+
+    def image(self, index):
+        size, color = self.images[self.image_ids[index]]
+        return get_surface(self.kind, size, color)
+
+    def copy(self):
+        # Independent store with the same entities; views are new objects
+        store = EntityStore(self.kind)
+        for column, source in zip(store.columns(), self.columns()):
+            column.extend(source)
+        store.images = list(self.images)
+        store.image_index = dict(self.image_index)
+        store.views = [EntityView(store, index) for index in range(len(self.views))]
+        store.free = list(self.free)
+        store.living = self.living
+        return store
+
+# Screen-space heading of each overworld direction (y grows downwards)
+DIRECTION_ANGLES = {"right": 0.0, "down": math.pi / 2, "left": math.pi, "up": -math.pi / 2}
 
 class OverworldMap:
-    def __init__(self):
+    def __init__(self, nodes=None, connections=None):
         # Create a more connected overworld with branching paths
-        self.nodes = [
+        self.nodes = nodes if nodes is not None else [
             # World 1 - Grass Land
             {"x": 100, "y": 100, "level": 1, "completed": False, "type": "start", "world": 1},
             {"x": 250, "y": 100, "level": 2, "completed": False, "type": "normal", "world": 1},
@@ -203,7 +623,7 @@ class OverworldMap:
         ]
         
         # Define connections between nodes (bidirectional)
-        self.connections = [
+        self.connections = connections if connections is not None else [
             (0, 1), (1, 2),  # World 1
             (1, 3), (2, 4),  # Branching to World 2
             (3, 5), (4, 5),  # Rejoining at World 3
@@ -213,19 +633,113 @@ class OverworldMap:
         self.current_node = 0
         self.player_pos = [self.nodes[0]["x"], self.nodes[0]["y"]]
         self.unlocked_nodes = {0}  # Start with first node unlocked
-        
-    def draw(self, screen):
+        self.compile()
+
+    def compile(self):
+        # Index the map once so moves and queries never scan connections:
+        # adjacency lists, a per-node table of neighbours ranked by how well
+        # they match each direction, and connected component labels
+        count = len(self.nodes)
+        self.adjacency = [[] for _ in range(count)]
+        for a, b in self.connections:
+            self.adjacency[a].append(b)
+            self.adjacency[b].append(a)
+
+        self.direction_moves = []
+        for index, node in enumerate(self.nodes):
+            moves = {}
+            for direction, heading in DIRECTION_ANGLES.items():
+                ranked = []
+                for neighbor in self.adjacency[index]:
+                    dx = self.nodes[neighbor]["x"] - node["x"]
+                    dy = self.nodes[neighbor]["y"] - node["y"]
+                    # Angle between the path and the direction, in [0, pi]
+                    deviation = abs((math.atan2(dy, dx) - heading + math.pi) % (2 * math.pi) - math.pi)
+                    if deviation < math.pi / 2:
+                        ranked.append((deviation, math.hypot(dx, dy), neighbor))
+                moves[direction] = [neighbor for _, _, neighbor in sorted(ranked)]
+            self.direction_moves.append(moves)
+
+        self.components = array("i", [-1] * count)
+        for start in range(count):
+            if self.components[start] < 0:
+                for node in self.breadth_first(start):
+                    self.components[node] = start
+        self.next_hops = {}  # Target node -> next node on a shortest path from each node
+        self.compile_tiles()
+
+    def compile_tiles(self):
+        # The static map (paths and node badges) is drawn into cached tiles
+        # of OVERWORLD_TILE_SIZE pixels. Record which connections and nodes
+        # touch each tile so a tile can be redrawn, or dropped when one of
+        # its nodes changes, without looking at the rest of the map.
+        self.tiles = {}
+        self.tile_contents = {}
+        self.node_tiles = []
+        self.incident = [[] for _ in self.nodes]
+        connection_tiles = []
+        for index, (a, b) in enumerate(self.connections):
+            start, end = self.nodes[a], self.nodes[b]
+            left, top = min(start["x"], end["x"]), min(start["y"], end["y"])
+            area = pygame.Rect(left, top, abs(end["x"] - start["x"]) + 1, abs(end["y"] - start["y"]) + 1)
+            connection_tiles.append(self.tiles_under(area.inflate(8, 8)))
+            for key in connection_tiles[-1]:
+                self.tile_contents.setdefault(key, ([], []))[0].append(index)
+            self.incident[a].append(index)
+            self.incident[b].append(index)
+        for index, node in enumerate(self.nodes):
+            # Badge circle plus room for a multi-digit level label
+            area = pygame.Rect(node["x"] - 21, node["y"] - 21, 64, 43)
+            self.node_tiles.append(self.tiles_under(area))
+            for key in self.node_tiles[-1]:
+                self.tile_contents.setdefault(key, ([], []))[1].append(index)
+        self.connection_tiles = connection_tiles
+
+        # Scroll only when the map does not fit on screen
+        xs = [node["x"] for node in self.nodes]
+        ys = [node["y"] for node in self.nodes]
+        self.bounds = pygame.Rect(min(xs) - 60, min(ys) - 60, max(xs) - min(xs) + 120, max(ys) - min(ys) + 120)
+        self.camera = [0, 0]
+
+    def tiles_under(self, area):
+        size = OVERWORLD_TILE_SIZE
+        return [(tx, ty) for tx in range(area.left // size, (area.right - 1) // size + 1)
+                for ty in range(area.top // size, (area.bottom - 1) // size + 1)]
+
+    def invalidate(self, nodes=None):
+        # Drop cached tiles showing the given nodes or their paths, or all
+        # tiles. Call after changing unlocked_nodes or completed flags.
+        if nodes is None:
+            self.tiles.clear()
+            return
+        for node in nodes:
+            for key in self.node_tiles[node]:
+                self.tiles.pop(key, None)
+            for connection in self.incident[node]:
+                for key in self.connection_tiles[connection]:
+                    self.tiles.pop(key, None)
+
+    def render_tile(self, key):
+        size = OVERWORLD_TILE_SIZE
+        left, top = key[0] * size, key[1] * size
+        tile = pygame.Surface((size, size))
+        tile.fill(MAGENTA)
+        connections, nodes = self.tile_contents[key]
+
         # Draw connections (paths) between nodes
-        for connection in self.connections:
-            start = self.nodes[connection[0]]
-            end = self.nodes[connection[1]]
+        for index in connections:
+            a, b = self.connections[index]
+            start = self.nodes[a]
+            end = self.nodes[b]
             
             # Only draw path if at least one node is unlocked
-            if connection[0] in self.unlocked_nodes or connection[1] in self.unlocked_nodes:
-                pygame.draw.line(screen, BROWN, (start["x"], start["y"]), (end["x"], end["y"]), 5)
+            if a in self.unlocked_nodes or b in self.unlocked_nodes:
+                pygame.draw.line(tile, BROWN, (start["x"] - left, start["y"] - top),
+                                 (end["x"] - left, end["y"] - top), 5)
             
         # Draw nodes
-        for i, node in enumerate(self.nodes):
+        for i in nodes:
+            node = self.nodes[i]
             # Determine node color based on type and state
             if node["type"] == "start":
                 color = GREEN
@@ -238,68 +752,60 @@ class OverworldMap:
                 
             # Draw node (only if unlocked)
             if i in self.unlocked_nodes:
-                pygame.draw.circle(screen, color, (node["x"], node["y"]), 20)
+                center = (node["x"] - left, node["y"] - top)
+                pygame.draw.circle(tile, color, center, 20)
                 
                 # Draw node border
                 border_color = DARK_GREEN if node["completed"] else BLACK
-                pygame.draw.circle(screen, border_color, (node["x"], node["y"]), 20, 2)
+                pygame.draw.circle(tile, border_color, center, 20, 2)
                 
                 # Draw level number
-                font = pygame.font.SysFont(None, 24)
-                text = font.render(str(node["level"]), True, WHITE)
-                screen.blit(text, (node["x"] - 5, node["y"] - 8))
+                text = render_text(str(node["level"]), WHITE, 24)
+                tile.blit(text, (center[0] - 5, center[1] - 8))
+        # The colorkey goes on last; alpha blits onto a keyed surface blend
+        # slightly differently from blits onto the screen
+        tile.set_colorkey(MAGENTA, pygame.RLEACCEL)
+        if pygame.display.get_surface() is not None:
+            tile = tile.convert()
+        self.tiles[key] = tile
+        return tile
+
+    def scroll_to_player(self, view_width, view_height):
+        # Keep the player centred on maps larger than the view
+        for axis, start, length, view in ((0, self.bounds.left, self.bounds.width, view_width),
+                                          (1, self.bounds.top, self.bounds.height, view_height)):
+            if start >= 0 and start + length <= view:
+                self.camera[axis] = 0
+            else:
+                position = int(self.player_pos[axis]) - view // 2
+                self.camera[axis] = max(start, min(position, start + length - view))
+        
+    def draw(self, screen):
+        # Blit the cached map tiles inside the view, then the player marker;
+        # the cost per frame depends on the view size, not the map size
+        width, height = screen.get_size()
+        self.scroll_to_player(width, height)
+        camera_x, camera_y = self.camera
+        size = OVERWORLD_TILE_SIZE
+        for key in self.tiles_under(pygame.Rect(camera_x, camera_y, width, height)):
+            if key in self.tile_contents:
+                tile = self.tiles.get(key) or self.render_tile(key)
+                screen.blit(tile, (key[0] * size - camera_x, key[1] * size - camera_y))
             
         # Draw player
-        pygame.draw.circle(screen, RED, (int(self.player_pos[0]), int(self.player_pos[1])), 15)
-        pygame.draw.circle(screen, (255, 100, 100), (int(self.player_pos[0]), int(self.player_pos[1])), 15, 2)
+        player = (int(self.player_pos[0]) - camera_x, int(self.player_pos[1]) - camera_y)
+        pygame.draw.circle(screen, RED, player, 15)
+        pygame.draw.circle(screen, (255, 100, 100), player, 15, 2)
         
     def move(self, direction):
-        current_node = self.nodes[self.current_node]
-        possible_moves = []
-        
-        # Find all connected nodes
-        for connection in self.connections:
-            if connection[0] == self.current_node and connection[1] in self.unlocked_nodes:
-                possible_moves.append(connection[1])
-            elif connection[1] == self.current_node and connection[0] in self.unlocked_nodes:
-                possible_moves.append(connection[0])
-        
-        if not possible_moves:
-            return False
-            
-        # Simple direction-based movement
-        # Find the node that best matches the direction
-        target_node = None
-        
-        for node_idx in possible_moves:
-            node = self.nodes[node_idx]
-            dx = node["x"] - current_node["x"]
-            dy = node["y"] - current_node["y"]
-            
-            # Check if this node is in the requested direction
-            if direction == "right" and dx > 0:
-                target_node = node_idx
-                break
-            elif direction == "left" and dx < 0:
-                target_node = node_idx
-                break
-            elif direction == "down" and dy > 0:
-                target_node = node_idx
-                break
-            elif direction == "up" and dy < 0:
-                target_node = node_idx
-                break
-                
-        # If no exact direction match, just pick the first available
-        if target_node is None and possible_moves:
-            target_node = possible_moves[0]
-            
-        if target_node is not None:
-            self.current_node = target_node
-            target_node_data = self.nodes[self.current_node]
-            self.player_pos = [target_node_data["x"], target_node_data["y"]]
-            return True
-            
+        # Follow the unlocked path closest in angle to the direction; paths
+        # pointing away from it (90 degrees or more) never match
+        for target_node in self.direction_moves[self.current_node][direction]:
+            if target_node in self.unlocked_nodes:
+                self.current_node = target_node
+                target_node_data = self.nodes[self.current_node]
+                self.player_pos = [target_node_data["x"], target_node_data["y"]]
+                return True
         return False
         
     def complete_current_level(self):
@@ -307,377 +813,467 @@ class OverworldMap:
         self.nodes[self.current_node]["completed"] = True
         
         # Unlock connected nodes
-        for connection in self.connections:
-            if connection[0] == self.current_node:
-                self.unlocked_nodes.add(connection[1])
-            elif connection[1] == self.current_node:
-                self.unlocked_nodes.add(connection[0])
+        self.unlocked_nodes.update(self.adjacency[self.current_node])
+        self.invalidate([self.current_node] + self.adjacency[self.current_node])
         
     def get_current_level(self):
         return self.nodes[self.current_node]["level"]
 
+    def snapshot(self):
+        # Current node, then unlocked and completed flags for every node
+        state = array("d", [self.current_node])
+        state.extend([i in self.unlocked_nodes for i in range(len(self.nodes))])
+        state.extend([node["completed"] for node in self.nodes])
+        return state
+
+    def restore(self, state):
+        count = len(self.nodes)
+        self.current_node = int(state[0])
+        self.unlocked_nodes = {i for i in range(count) if state[1 + i]}
+        for i, node in enumerate(self.nodes):
+            node["completed"] = bool(state[1 + count + i])
+        node = self.nodes[self.current_node]
+        self.player_pos = [node["x"], node["y"]]
+        self.invalidate()
+
+    def neighbors(self, node_index):
+        # Nodes connected to node_index, locked or not
+        return list(self.adjacency[node_index])
+
+    def breadth_first(self, start, allowed=None):
+        # Breadth-first parent of every node reachable from start (start
+        # maps to None), optionally only passing through nodes in allowed
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for neighbor in self.adjacency[node]:
+                if neighbor not in parents and (allowed is None or neighbor in allowed):
+                    parents[neighbor] = node
+                    queue.append(neighbor)
+        return parents
+
+    def reachable(self, source, target):
+        return self.components[source] == self.components[target]
+
+    def shortest_path(self, source, target, unlocked_only=False):
+        # Fewest-moves path from source to target as a node list, or None.
+        # Paths over the whole map come from a per-target next-hop table
+        # built once; unlocked_only searches the currently unlocked nodes.
+        if unlocked_only:
+            if target not in self.unlocked_nodes:
+                return None
+            next_hop = self.breadth_first(target, self.unlocked_nodes)
+            if source not in next_hop:
+                return None
+        else:
+            if not self.reachable(source, target):
+                return None
+            next_hop = self.next_hops.get(target)
+            if next_hop is None:
+                next_hop = self.next_hops[target] = array("i", [-1] * len(self.nodes))
+                for node, parent in self.breadth_first(target).items():
+                    if parent is not None:
+                        next_hop[node] = parent
+        path = [source]
+        while path[-1] != target:
+            path.append(next_hop[path[-1]])
+        return path
+
+# Level.snapshot() layout sizes
+LEVEL_STATE_FIELDS = 10
+ENEMY_STATE_FIELDS = 4
+
+# Level files: declarative JSON sources plus a compiled binary cache
+LEVEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+LEVEL_CACHE_MAGIC = b"LVLC"
+LEVEL_CACHE_VERSION = 1
+# Magic, version, source mtime_ns, source size
+LEVEL_CACHE_HEADER = struct.Struct("<4sIqq")
+# World, background rgb, platform rgb, clouds, has goal, goal x/y, platform,
+# coin and enemy counts, name length, then (count, x0, x1, y0, y1) for the
+# coin and enemy spawn rules. Everything after the header is int32 so the
+# arrays that follow stay aligned for memory mapping.
+LEVEL_CACHE_META = struct.Struct("<25i")
+
+# Endless levels are generated in screen-wide chunks
+CHUNK_WIDTH = SCREEN_WIDTH
+CHUNKS_AHEAD = 1  # Chunks generated past the right edge of the view
+CHUNKS_BEHIND = 1  # Chunks kept past the left edge; the player can walk back this far
+CAMERA_LEAD = SCREEN_WIDTH // 3  # Player distance from the left edge of the view
+ACTIVE_MARGIN = 200  # Enemies this close to the view are simulated, the rest sleep
+CHUNK_SAFE_WIDTH = 250  # Solid ground at the start of every chunk for respawning
+CHUNK_COLORS = (GREEN, BROWN, GRAY, PURPLE, ORANGE, DARK_GREEN)
+CHUNKS_PER_THEME = 16
+STREAM_STATE_FIELDS = 4
+
+def level_path(level_number):
+    return os.path.join(LEVEL_DIR, f"level{level_number}.json")
+
+def level_seed(campaign_seed, level_number):
+    # Derive a stable per-level seed from the campaign seed
+    return random.Random(f"{campaign_seed}:{level_number}").getrandbits(32)
+
+def spawn_coord(rng, low, high):
+    # Fixed coordinates are stored as a one-value range and use no randomness
+    return low if low == high else rng.randint(low, high)
+
+def _spawn_rule(rule):
+    # Normalize {"count": n, "x": [lo, hi] or v, "y": ...} to a flat tuple
+    if not rule:
+        return (0, 0, 0, 0, 0)
+    bounds = []
+    for axis in ("x", "y"):
+        value = rule[axis]
+        bounds += value if isinstance(value, list) else [value, value]
+    return (rule["count"], *bounds)
+
+def parse_level(source):
+    # Turn a JSON level description into flat, array-backed level data
+    theme = source.get("theme", {})
+    platform_color = tuple(theme.get("platform", GREEN))
+    platforms = array("i")
+    for entry in source.get("platforms", []):
+        platforms.extend(entry[:4])
+        platforms.extend(entry[4] if len(entry) > 4 else platform_color)
+    coins = array("i")
+    for position in source.get("coins", []):
+        coins.extend(position)
+    enemies = array("i")
+    for position in source.get("enemies", []):
+        enemies.extend(position)
+    spawn = source.get("spawn", {})
+    goal = source.get("goal")
+    return {
+        "name": source.get("name", ""),
+        "world": source.get("world", 1),
+        "background": tuple(theme.get("background", SKY_BLUE)),
+        "platform_color": platform_color,
+        "clouds": bool(theme.get("clouds", False)),
+        "platforms": platforms,
+        "coins": coins,
+        "enemies": enemies,
+        "goal": tuple(goal) if goal else None,
+        "spawn_coins": _spawn_rule(spawn.get("coins")),
+        "spawn_enemies": _spawn_rule(spawn.get("enemies")),
+    }
+
+def compile_level(data, source_stat=None):
+    # Serialize level data to the binary cache format
+    mtime_ns, size = (source_stat.st_mtime_ns, source_stat.st_size) if source_stat else (0, 0)
+    name = data["name"].encode("utf-8")
+    goal = data["goal"] or (0, 0)
+    meta = LEVEL_CACHE_META.pack(
+        data["world"], *data["background"], *data["platform_color"], data["clouds"],
+        data["goal"] is not None, *goal,
+        len(data["platforms"]) // 7, len(data["coins"]) // 2, len(data["enemies"]) // 2, len(name),
+        *data["spawn_coins"], *data["spawn_enemies"])
+    body = array("i", data["platforms"])
+    body.extend(data["coins"])
+    body.extend(data["enemies"])
+    if sys.byteorder == "big":
+        body.byteswap()
+    padding = b"\0" * (-len(name) % 4)
+    return (LEVEL_CACHE_HEADER.pack(LEVEL_CACHE_MAGIC, LEVEL_CACHE_VERSION, mtime_ns, size)
+            + meta + body.tobytes() + name + padding)
+
+def read_compiled_level(path, source_stat=None):
+    # Map a compiled level and bulk-copy its arrays out. Returns None if the
+    # file is not a current cache for the given source.
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if len(view) < LEVEL_CACHE_HEADER.size + LEVEL_CACHE_META.size:
+                return None
+            magic, version, mtime_ns, size = LEVEL_CACHE_HEADER.unpack_from(view, 0)
+            if magic != LEVEL_CACHE_MAGIC or version != LEVEL_CACHE_VERSION:
+                return None
+            if source_stat is not None and (mtime_ns, size) != (source_stat.st_mtime_ns, source_stat.st_size):
+                return None
+            meta = LEVEL_CACHE_META.unpack_from(view, LEVEL_CACHE_HEADER.size)
+            offset = LEVEL_CACHE_HEADER.size + LEVEL_CACHE_META.size
+            arrays = []
+            for length in (meta[11] * 7, meta[12] * 2, meta[13] * 2):
+                values = array("i")
+                values.frombytes(view[offset:offset + length * 4])
+                if sys.byteorder == "big":
+                    values.byteswap()
+                arrays.append(values)
+                offset += length * 4
+            name = view[offset:offset + meta[14]].decode("utf-8")
+    platforms, coins, enemies = arrays
+    return {
+        "name": name,
+        "world": meta[0],
+        "background": meta[1:4],
+        "platform_color": meta[4:7],
+        "clouds": bool(meta[7]),
+        "platforms": platforms,
+        "coins": coins,
+        "enemies": enemies,
+        "goal": meta[9:11] if meta[8] else None,
+        "spawn_coins": meta[15:20],
+        "spawn_enemies": meta[20:25],
+    }
+
+def load_level(path):
+    # Load a level from its JSON source, going through the compiled cache
+    # next to it. The cache is rebuilt whenever the source's mtime or size
+    # changes; a cache shipped without its source is used as is.
+    cache_path = os.path.splitext(path)[0] + ".lvlc"
+    try:
+        source_stat = os.stat(path)
+    except FileNotFoundError:
+        return read_compiled_level(cache_path)
+    try:
+        data = read_compiled_level(cache_path, source_stat)
+    except (OSError, ValueError, struct.error):
+        data = None
+    if data is not None:
+        return data
+    with open(path) as f:
+        data = parse_level(json.load(f))
+    # Write the cache beside the source and rename it into place, so other
+    # processes building the same level never read a half-written file
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or ".", suffix=".tmp")
+    except OSError:
+        return data  # Read-only level directory; keep using the source
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(compile_level(data, source_stat))
+        os.replace(temp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    return data
+
 class Level:
-    def __init__(self, level_number, player_lives):
+    def __init__(self, level_number, player_lives, level_file=None, campaign_seed=None):
         self.level_number = level_number
-        self.all_sprites = pygame.sprite.Group()
-        self.platforms = pygame.sprite.Group()
-        self.coins = pygame.sprite.Group()
-        self.enemies = pygame.sprite.Group()
+        # Random placement comes from a per-level generator so the same
+        # campaign seed always rebuilds the same layout
+        if campaign_seed is None:
+            campaign_seed = random.randrange(2 ** 32)
+        self.campaign_seed = campaign_seed
+        self.seed = level_seed(campaign_seed, level_number)
+        self.rng = random.Random(self.seed)
+        # Platforms, coins and enemies live in compact entity stores
+        self.platforms = EntityStore("platform")
+        self.coins = EntityStore("coin")
+        self.enemies = EntityStore("enemy")
         self.goals = pygame.sprite.Group()
         self.score = 0
         self.completed = False
+        self.ticks = 0
+        self.jump_requested = False
+        self.static_layer = None
+        self.actor_rects = None
+        self.collected_rects = []
+        self.profiler = None  # FrameProfiler timing step() phases, if any
+        self.previous_positions = None  # Actor positions before the last step
+        self.show_clouds = True  # Turned off by the game on slow frames
         
         # Create player with current lives
         self.player = Player(100, 300)
         self.player.lives = player_lives
-        self.all_sprites.add(self.player)
         
         # Create level based on level number
-        self.create_level(level_number)
-        
-    def create_level(self, level_number):
-        # Ground
-        ground = Platform(0, SCREEN_HEIGHT - 40, SCREEN_WIDTH, 40)
-        self.all_sprites.add(ground)
-        self.platforms.add(ground)
-        
-        if level_number == 1:
-            self.create_level1()
-        elif level_number == 2:
-            self.create_level2()
-        elif level_number == 3:
-            self.create_level3()
-        elif level_number == 4:
-            self.create_level4()
-        elif level_number == 5:
-            self.create_level5()
-        elif level_number == 6:
-            self.create_level6()
-        elif level_number == 7:
-            self.create_level7()
-        elif level_number == 8:
-            self.create_level8()
-            
-    def create_level1(self):
-        # World 1-1: Simple beginner level
-        platforms_data = [
-            (100, 450, 200, 20),
-            (400, 400, 150, 20),
-            (200, 350, 100, 20),
-            (500, 300, 200, 20),
-        ]
-        
-        for x, y, width, height in platforms_data:
-            platform = Platform(x, y, width, height)
-            self.all_sprites.add(platform)
-            self.platforms.add(platform)
-            
-        # Coins
-        coin_positions = [(150, 400), (450, 350), (250, 300), (550, 250)]
-        for x, y in coin_positions:
-            coin = Coin(x, y)
-            self.all_sprites.add(coin)
-            self.coins.add(coin)
-            
-        # Goal
-        goal = Goal(700, 340)
-        self.all_sprites.add(goal)
-        self.goals.add(goal)
-            
-    def create_level2(self):
-        # World 1-2: Level with more platforms and enemies
-        platforms_data = [
-            (100, 450, 200, 20),
-            (400, 400, 150, 20),
-            (200, 350, 100, 20),
-            (500, 300, 200, 20),
-            (100, 250, 150, 20),
-        ]
-        
-        for x, y, width, height in platforms_data:
-            platform = Platform(x, y, width, height)
-            self.all_sprites.add(platform)
-            self.platforms.add(platform)
-            
-        # Coins
-        for i in range(8):
-            coin = Coin(random.randint(50, SCREEN_WIDTH - 50), 
-                       random.randint(100, SCREEN_HEIGHT - 100))
-            self.all_sprites.add(coin)
-            self.coins.add(coin)
-            
-        # Enemies
-        for i in range(2):
-            enemy = Enemy(random.randint(100, SCREEN_WIDTH - 100), 
-                         SCREEN_HEIGHT - 70)
-            self.all_sprites.add(enemy)
-            self.enemies.add(enemy)
-            
-        # Goal
-        goal = Goal(700, 240)
-        self.all_sprites.add(goal)
-        self.goals.add(goal)
-            
-    def create_level3(self):
-        # World 1-3: Challenging level with gaps
-        platforms_data = [
-            (0, 450, 150, 20),
-            (250, 450, 150, 20),
-            (500, 450, 150, 20),
-            (100, 350, 150, 20),
-            (350, 350, 150, 20),
-            (600, 350, 150, 20),
-            (200, 250, 150, 20),
-            (450, 250, 150, 20),
-        ]
+        self.create_level(level_number, level_file)
         
-        for x, y, width, height in platforms_data:
-            platform = Platform(x, y, width, height)
-            self.all_sprites.add(platform)
-            self.platforms.add(platform)
-            
-        # Coins
-        for i in range(10):
-            coin = Coin(random.randint(50, SCREEN_WIDTH - 50), 
-                       random.randint(100, SCREEN_HEIGHT - 100))
-            self.all_sprites.add(coin)
-            self.coins.add(coin)
-            
-        # Enemies
-        for i in range(3):
-            enemy = Enemy(random.randint(100, SCREEN_WIDTH - 100), 
-                         SCREEN_HEIGHT - 70)
-            self.all_sprites.add(enemy)
-            self.enemies.add(enemy)
-            
-        # Goal
-        goal = Goal(700, 200)
-        self.all_sprites.add(goal)
-        self.goals.add(goal)
-            
-    def create_level4(self):
-        # World 2-1: Desert theme with pyramids
-        platforms_data = [
-            (100, 450, 200, 20),
-            (150, 350, 100, 20),
-            (200, 250, 100, 20),
-            (500, 450, 200, 20),
-            (450, 350, 100, 20),
-            (400, 250, 100, 20),
-            (300, 150, 200, 20),  # Pyramid top
-        ]
-        
-        for x, y, width, height in platforms_data:
-            platform = Platform(x, y, width, height, (210, 180, 140))  # Sand color
-            self.all_sprites.add(platform)
-            self.platforms.add(platform)
-            
-        # Coins
-        for i in range(12):
-            coin = Coin(random.randint(50, SCREEN_WIDTH - 50), 
-                       random.randint(100, SCREEN_HEIGHT - 100))
-            self.all_sprites.add(coin)
-            self.coins.add(coin)
-            
-        # Enemies
-        for i in range(4):
-            enemy = Enemy(random.randint(100, SCREEN_WIDTH - 100), 
-                         SCREEN_HEIGHT - 70)
-            self.all_sprites.add(enemy)
-            self.enemies.add(enemy)
-            
-        # Goal
-        goal = Goal(350, 100)
-        self.all_sprites.add(goal)
-        self.goals.add(goal)
-            
-    def create_level5(self):
-        # World 2-2: Boss level - more challenging
-        platforms_data = [
-            (0, 450, 100, 20),
-            (150, 450, 100, 20),
-            (300, 450, 100, 20),
-            (450, 450, 100, 20),
-            (600, 450, 100, 20),
-            (50, 350, 100, 20),
-            (250, 350, 100, 20),
-            (450, 350, 100, 20),
-            (650, 350, 100, 20),
-            (100, 250, 100, 20),
-            (350, 250, 100, 20),
-            (600, 250, 100, 20),
-        ]
-        
-        for x, y, width, height in platforms_data:
-            platform = Platform(x, y, width, height, (210, 180, 140))  # Sand color
-            self.all_sprites.add(platform)
-            self.platforms.add(platform)
-            
-        # Coins
-        for i in range(15):
-            coin = Coin(random.randint(50, SCREEN_WIDTH - 50), 
-                       random.randint(100, SCREEN_HEIGHT - 100))
-            self.all_sprites.add(coin)
-            self.coins.add(coin)
-            
-        # Enemies
-        for i in range(5):
-            enemy = Enemy(random.randint(100, SCREEN_WIDTH - 100), 
-                         SCREEN_HEIGHT - 70)
-            self.all_sprites.add(enemy)
-            self.enemies.add(enemy)
-            
-        # Goal
-        goal = Goal(700, 200)
-        self.all_sprites.add(goal)
-        self.goals.add(goal)
-            
-    def create_level6(self):
-        # World 3-1: Sky world with floating platforms
-        platforms_data = [
-            (100, 450, 200, 20),
-            (400, 400, 150, 20),
-            (200, 350, 100, 20),
-            (500, 300, 200, 20),
-            (100, 250, 150, 20),
-            (350, 200, 100, 20),
-            (600, 150, 100, 20),
-        ]
-        
-        for x, y, width, height in platforms_data:
-            platform = Platform(x, y, width, height, (200, 200, 255))  # Light blue
-            self.all_sprites.add(platform)
-            self.platforms.add(platform)
-            
-        # Coins
-        for i in range(10):
-            coin = Coin(random.randint(50, SCREEN_WIDTH - 50), 
-                       random.randint(100, SCREEN_HEIGHT - 100))
-            self.all_sprites.add(coin)
-            self.coins.add(coin)
-            
-        # Enemies
-        for i in range(3):
-            enemy = Enemy(random.randint(100, SCREEN_WIDTH - 100), 
-                         SCREEN_HEIGHT - 70)
-            self.all_sprites.add(enemy)
-            self.enemies.add(enemy)
-            
-        # Goal
-        goal = Goal(650, 100)
-        self.all_sprites.add(goal)
-        self.goals.add(goal)
-            
-    def create_level7(self):
-        # World 3-2: Penultimate challenge
-        platforms_data = [
-            (0, 450, 150, 20),
-            (250, 450, 150, 20),
-            (500, 450, 150, 20),
-            (100, 350, 150, 20),
-            (350, 350, 150, 20),
-            (600, 350, 150, 20),
-            (200, 250, 150, 20),
-            (450, 250, 150, 20),
-            (300, 150, 150, 20),
-        ]
-        
-        for x, y, width, height in platforms_data:
-            platform = Platform(x, y, width, height, (200, 200, 255))  # Light blue
-            self.all_sprites.add(platform)
-            self.platforms.add(platform)
-            
-        # Coins
-        for i in range(12):
-            coin = Coin(random.randint(50, SCREEN_WIDTH - 50), 
-                       random.randint(100, SCREEN_HEIGHT - 100))
-            self.all_sprites.add(coin)
-            self.coins.add(coin)
-            
+    def create_level(self, level_number, level_file=None):
+        # Build the level from its data file (a builtin level by default)
+        data = load_level(level_file or level_path(level_number))
+        self.level_data = data
+        self.background_color = data["background"]
+        self.has_clouds = data["clouds"]
+
+        platforms = data["platforms"]
+        for i in range(0, len(platforms), 7):
+            x, y, width, height, r, g, b = platforms[i:i + 7]
+            self.platforms.add(x, y, width, height, (r, g, b))
+
+        # Coins, fixed ones first and then randomly placed ones
+        coins = data["coins"]
+        for i in range(0, len(coins), 2):
+            self.coins.add(coins[i], coins[i + 1], *COIN_SIZE, COIN_COLOR)
+        count, x0, x1, y0, y1 = data["spawn_coins"]
+        for i in range(count):
+            self.coins.add(spawn_coord(self.rng, x0, x1), spawn_coord(self.rng, y0, y1), *COIN_SIZE, COIN_COLOR)
+
         # Enemies
-        for i in range(4):
-            enemy = Enemy(random.randint(100, SCREEN_WIDTH - 100), 
-                         SCREEN_HEIGHT - 70)
-            self.all_sprites.add(enemy)
-            self.enemies.add(enemy)
-            
+        enemies = data["enemies"]
+        for i in range(0, len(enemies), 2):
+            self.enemies.add(enemies[i], enemies[i + 1], *ENEMY_SIZE, ENEMY_COLOR, speed=ENEMY_SPEED)
+        count, x0, x1, y0, y1 = data["spawn_enemies"]
+        for i in range(count):
+            self.enemies.add(spawn_coord(self.rng, x0, x1), spawn_coord(self.rng, y0, y1), *ENEMY_SIZE,
+                             ENEMY_COLOR, speed=ENEMY_SPEED)
+
         # Goal
-        goal = Goal(700, 100)
-        self.all_sprites.add(goal)
-        self.goals.add(goal)
-            
-    def create_level8(self):
-        # World 4-1: Final castle level
-        platforms_data = [
-            (0, 450, 100, 20),
-            (150, 450, 100, 20),
-            (300, 450, 100, 20),
-            (450, 450, 100, 20),
-            (600, 450, 100, 20),
-            (700, 450, 100, 20),
-            (50, 350, 100, 20),
-            (250, 350, 100, 20),
-            (450, 350, 100, 20),
-            (650, 350, 100, 20),
-            (100, 250, 100, 20),
-            (350, 250, 100, 20),
-            (600, 250, 100, 20),
-            (200, 150, 100, 20),
-            (500, 150, 100, 20),
-            (350, 50, 100, 20),  # Top platform - goal
-        ]
-        
-        for x, y, width, height in platforms_data:
-            platform = Platform(x, y, width, height, (150, 150, 150))  # Gray for castle
-            self.all_sprites.add(platform)
-            self.platforms.add(platform)
-            
-        # Coins
-        for i in range(20):  # More coins in final level
-            coin = Coin(random.randint(50, SCREEN_WIDTH - 50), 
-                       random.randint(100, SCREEN_HEIGHT - 100))
-            self.all_sprites.add(coin)
-            self.coins.add(coin)
-            
-        # Enemies
-        for i in range(6):  # More enemies in final level
-            enemy = Enemy(random.randint(100, SCREEN_WIDTH - 100), 
-                         SCREEN_HEIGHT - 70)
-            self.all_sprites.add(enemy)
-            self.enemies.add(enemy)
+        if data["goal"] is not None:
+            self.goals.add(Goal(*data["goal"]))
+
+        # Every coin and enemy the level started with, alive or not, in
+        # creation order; snapshots refer to them by position
+        self.coin_roster = self.coins.sprites()
+        self.enemy_roster = self.enemies.sprites()
+        self.build_spatial_index()
+
+    def build_spatial_index(self):
+        # Static grids for geometry and pickups, a dynamic one for enemies
+        self.platform_grid = SpatialGrid(self.platforms)
+        self.coin_grid = SpatialGrid(self.coins)
+        self.goal_grid = SpatialGrid(self.goals)
+        self.enemy_grid = SpatialGrid(self.enemies)
+
+    def clone(self):
+        # Cheap copy: platforms, goals, their grids and the baked render
+        # layers never change after building and are shared, while the
+        # player, coins, enemies and other mutable state are copied
+        level = copy.copy(self)
+        level.rng = random.Random()
+        level.rng.setstate(self.rng.getstate())
+        level.jump_requested = False
+        level.actor_rects = None
+        level.collected_rects = []
+        level.previous_positions = None
+        level.player = self.player.clone()
+        level.coins = self.coins.copy()
+        level.enemies = self.enemies.copy()
+        level.coin_roster = [level.coins.views[coin.index] for coin in self.coin_roster]
+        level.enemy_roster = [level.enemies.views[enemy.index] for enemy in self.enemy_roster]
+        level.coin_grid = SpatialGrid()
+        level.enemy_grid = SpatialGrid()
+        for index, coin in enumerate(level.coin_roster):
+            if coin.alive():
+                level.coin_grid.insert(coin, index)
+        for index, enemy in enumerate(level.enemy_roster):
+            if enemy.alive():
+                level.enemy_grid.insert(enemy, index)
+        return level
+
+    def snapshot(self):
+        # Flat copy of all mutable level state: LEVEL_STATE_FIELDS player
+        # and level values, then (alive, x, y, direction) per roster enemy,
+        # then one alive flag per roster coin
+        player = self.player
+        state = array("d", (player.rect.x, player.rect.y, player.vel_x, player.vel_y,
+                            player.on_ground, player.facing_right, player.lives,
+                            self.score, self.ticks, self.completed))
+        for enemy in self.enemy_roster:
+            state.extend((enemy.alive(), enemy.x, enemy.y, enemy.direction))
+        state.extend([coin.alive() for coin in self.coin_roster])
+        return state
+
+    def restore(self, state):
+        # Inverse of snapshot() for a level built from the same data and seed
+        player = self.player
+        player.rect.x = int(state[0])
+        player.rect.y = int(state[1])
+        player.vel_x = int(state[2])
+        player.vel_y = state[3]
+        player.on_ground = bool(state[4])
+        player.facing_right = bool(state[5])
+        player.lives = int(state[6])
+        self.score = int(state[7])
+        self.ticks = int(state[8])
+        self.completed = bool(state[9])
+        self.jump_requested = False
+        self.actor_rects = None
+
+        i = LEVEL_STATE_FIELDS
+        for index, enemy in enumerate(self.enemy_roster):
+            if state[i]:
+                enemy.x = int(state[i + 1])
+                enemy.y = int(state[i + 2])
+                enemy.direction = int(state[i + 3])
+                if enemy.alive():
+                    self.enemy_grid.move(enemy)
+                else:
+                    enemy.revive()
+                    self.enemy_grid.insert(enemy, index)
+            elif enemy.alive():
+                enemy.kill()
+                self.enemy_grid.remove(enemy)
+            i += ENEMY_STATE_FIELDS
+
+        for index, coin in enumerate(self.coin_roster):
+            if state[i + index]:
+                if not coin.alive():
+                    coin.revive()
+                    self.coin_grid.insert(coin, index)
+            elif coin.alive():
+                coin.kill()
+                self.coin_grid.remove(coin)
             
-        # Goal
-        goal = Goal(370, 10)
-        self.all_sprites.add(goal)
-        self.goals.add(goal)
-    
     def handle_events(self, event):
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_SPACE:
-                self.player.jump()
-                    
-    def update(self):
+                self.jump_requested = True
+
+    def read_inputs(self):
+        # Build this tick's input vector from the keyboard
         keys = pygame.key.get_pressed()
+        inputs = 0
         if keys[pygame.K_LEFT]:
-            self.player.move_left()
+            inputs |= INPUT_LEFT
         elif keys[pygame.K_RIGHT]:
+            inputs |= INPUT_RIGHT
+        if self.jump_requested:
+            inputs |= INPUT_JUMP
+            self.jump_requested = False
+        return inputs
+                    
+    def update(self):
+        return self.step(self.read_inputs())
+
+    def step(self, inputs, dt=1):
+        # Advance the level from an explicit input vector by dt ticks in one
+        # physics step; dt > 1 trades accuracy for fewer steps
+        if inputs & INPUT_JUMP:
+            self.player.jump()
+        if inputs & INPUT_LEFT:
+            self.player.move_left()
+        elif inputs & INPUT_RIGHT:
             self.player.move_right()
         else:
             self.player.stop()
             
-        self.all_sprites.update(self.platforms)
+        profiler = self.profiler
+        if profiler is not None:
+            start = perf_counter()
+            
+        self.ticks += dt
+        # Only the player and awake enemies move; platforms, coins and the
+        # goal are static and never ticked
+        self.player.update(self.platform_grid, dt)
+        active = self.active_enemies()
+        for enemy in active:
+            enemy.update(self.platform_grid, dt)
+            self.enemy_grid.move(enemy)
+        if profiler is not None:
+            profiler.count("active_enemies", len(active))
+            start = profiler.add("physics", start)
         
         # Check for coin collisions
-        coin_hits = pygame.sprite.spritecollide(self.player, self.coins, True)
+        coin_hits = self.coin_grid.collide(self.player.rect)
         for coin in coin_hits:
+            coin.kill()
+            self.coin_grid.remove(coin)
+            self.collected_rects.append(coin.rect)
             self.score += 10
+        if profiler is not None:
+            start = profiler.add("coins", start)
             
         # Check for enemy collisions
-        enemy_hits = pygame.sprite.spritecollide(self.player, self.enemies, False)
+        enemy_hits = self.enemy_grid.collide(self.player.rect)
         for enemy in enemy_hits:
             # If player is falling and hits enemy from above
             if self.player.vel_y > 0 and self.player.rect.bottom < enemy.rect.centery:
                 enemy.kill()
+                self.enemy_grid.remove(enemy)
                 self.player.vel_y = JUMP_STRENGTH / 2  # Small bounce
                 self.score += 100
             else:
@@ -685,64 +1281,1116 @@ class Level:
                 self.player.lives -= 1
                 self.player.reset_position()
                 if self.player.lives <= 0:
+                    if profiler is not None:
+                        self.profile_collisions(profiler, start)
                     return "game_over"
+        if profiler is not None:
+            start = profiler.add("enemies", start)
                 
         # Check if player reached the goal
-        goal_hits = pygame.sprite.spritecollide(self.player, self.goals, False)
-        if goal_hits:
+        reached_goal = self.goal_grid.any_collide(self.player.rect)
+        if profiler is not None:
+            self.profile_collisions(profiler, start)
+        if reached_goal:
             self.completed = True
             return "completed"
                 
         return "playing"
+
+    def active_enemies(self):
+        # A fixed level fits on one screen, so every enemy is always awake
+        return self.enemies.sprites()
+
+    def remember_positions(self):
+        # Called before a step so frames between steps can be interpolated
+        self.previous_positions = {sprite: sprite.rect.topleft
+                                   for sprite in [self.player] + self.active_enemies()}
+
+    def interpolate(self, key, x, y, alpha):
+        # The point alpha of the way from where key was before the last step
+        # to (x, y)
+        previous = self.previous_positions
+        if alpha >= 1 or previous is None or key not in previous:
+            return x, y
+        old_x, old_y = previous[key]
+        if abs(x - old_x) > INTERPOLATE_MAX_DISTANCE or abs(y - old_y) > INTERPOLATE_MAX_DISTANCE:
+            return x, y
+        return round(old_x + (x - old_x) * alpha), round(old_y + (y - old_y) * alpha)
+
+    def profile_collisions(self, profiler, start):
+        profiler.add("goal", start)
+        for grid in (self.platform_grid, self.coin_grid, self.enemy_grid, self.goal_grid):
+            profiler.count("collision_tests", grid.tests)
+            grid.tests = 0
     
-    def draw(self, screen):
-        # Different background colors based on world
-        if self.level_number <= 3:
-            screen.fill(SKY_BLUE)  # World 1 - Grass Land
-        elif self.level_number <= 5:
-            screen.fill((255, 220, 150))  # World 2 - Desert Hills
-        elif self.level_number <= 7:
-            screen.fill(LIGHT_BLUE)  # World 3 - Sky World
-        else:
-            screen.fill((200, 230, 255))  # World 4 - Ice Land
-        
-        # Draw clouds in the background for appropriate worlds
-        if self.level_number <= 3 or self.level_number >= 6:
-            for i in range(5):
-                x = (i * 200 + pygame.time.get_ticks() // 100) % (SCREEN_WIDTH + 200) - 100
-                y = 50 + i * 30
+    def build_static_layers(self):
+        # Bake the background fill and every platform into one cached layer.
+        # Cloud levels also get a colorkeyed platform-only layer so platforms
+        # can be restored on top of the moving clouds.
+        self.static_layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.static_layer.fill(self.background_color)
+        for platform in self.platforms:
+            self.static_layer.blit(platform.image, platform.rect)
+        self.platform_layer = None
+        if self.has_clouds:
+            self.platform_layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            self.platform_layer.fill(MAGENTA)
+            self.platform_layer.set_colorkey(MAGENTA, pygame.RLEACCEL)
+            for platform in self.platforms:
+                self.platform_layer.blit(platform.image, platform.rect)
+        if pygame.display.get_surface() is not None:
+            self.static_layer = self.static_layer.convert()
+            if self.platform_layer is not None:
+                self.platform_layer = self.platform_layer.convert()
+
+    def cloud_positions(self):
+        if not (self.has_clouds and self.show_clouds):
+            return []
+        offset = pygame.time.get_ticks() // 100
+        return [((i * 200 + offset) % (SCREEN_WIDTH + 200) - 100, 50 + i * 30) for i in range(5)]
+
+    def draw_scenery(self, screen, clouds, area=None):
+        # Redraw everything that does not move on its own (background,
+        # clouds, platforms, remaining coins and the goal) inside area
+        if self.static_layer is None:
+            self.build_static_layers()
+        if area is None:
+            area = screen.get_rect()
+        clip = screen.get_clip()
+        screen.set_clip(area)
+        screen.blit(self.static_layer, area, area)
+        # These grid queries are for drawing, so they are kept out of the
+        # collision_tests the profiler reads after the next step
+        coin_tests, goal_tests = self.coin_grid.tests, self.goal_grid.tests
+        if clouds:
+            for x, y in clouds:
                 pygame.draw.ellipse(screen, WHITE, (x, y, 100, 40))
                 pygame.draw.ellipse(screen, WHITE, (x + 20, y - 20, 80, 40))
                 pygame.draw.ellipse(screen, WHITE, (x + 40, y + 10, 60, 40))
-        
-        # Draw all sprites
-        self.all_sprites.draw(screen)
-        
+            screen.blit(self.platform_layer, area, area)
+        for coin in self.coin_grid.collide(area):
+            screen.blit(coin.image, coin.rect)
+        for goal in self.goal_grid.collide(area):
+            screen.blit(goal.image, goal.rect)
+        self.coin_grid.tests, self.goal_grid.tests = coin_tests, goal_tests
+        screen.set_clip(clip)
+
+    def draw_actors(self, screen, alpha=1.0):
+        # Draw the moving sprites alpha of the way through the last step and
+        # the HUD, returning the areas covered
+        drawn = []
+        for sprite in [self.player] + self.enemies.sprites():
+            rect = sprite.rect
+            if alpha < 1:
+                rect = pygame.Rect(self.interpolate(sprite, rect.x, rect.y, alpha), rect.size)
+            drawn.append(screen.blit(sprite.image, rect))
+
         # Draw level number, score and lives
-        font = pygame.font.SysFont(None, 36)
-        level_text = font.render(f"Level: {self.level_number}", True, WHITE)
-        screen.blit(level_text, (10, 10))
+        level_text = render_text(f"Level: {self.level_number}", WHITE, 36)
+        drawn.append(screen.blit(level_text, (10, 10)))
         
-        score_text = font.render(f"Score: {self.score}", True, WHITE)
-        screen.blit(score_text, (10, 50))
+        score_text = render_text(f"Score: {self.score}", WHITE, 36)
+        drawn.append(screen.blit(score_text, (10, 50)))
         
-        lives_text = font.render(f"Lives: {self.player.lives}", True, WHITE)
+        lives_text = render_text(f"Lives: {self.player.lives}", WHITE, 36)
+        drawn.append(screen.blit(lives_text, (10, 90)))
+        return drawn
+
+    def draw(self, screen, alpha=1.0):
+        # Full redraw; the caller presents the frame
+        clouds = self.cloud_positions()
+        self.draw_scenery(screen, clouds)
+        self.actor_rects = self.draw_actors(screen, alpha)
+        self.drawn_clouds = clouds
+
+    def draw_dirty(self, screen, alpha=1.0):
+        # Only repaint the areas the last frame's actors and HUD covered,
+        # plus clouds that moved, and return the rects that need presenting
+        if self.actor_rects is None:
+            self.draw(screen, alpha)
+            return [screen.get_rect()]
+        restore = self.actor_rects + self.collected_rects
+        self.collected_rects = []
+        clouds = self.cloud_positions()
+        if clouds != self.drawn_clouds:
+            restore = restore + [pygame.Rect(x, y - 20, 100, 70) for x, y in self.drawn_clouds + clouds]
+            self.drawn_clouds = clouds
+        for area in restore:
+            self.draw_scenery(screen, clouds, area)
+        self.actor_rects = self.draw_actors(screen, alpha)
+        return restore + self.actor_rects
+
+def generate_chunk(seed, index):
+    # Build chunk index of an endless level, using the same flat layout as
+    # parse_level(): platforms are (x, y, w, h, r, g, b), coins (x, y) and
+    # enemies (x, y, min_x, max_x) in world coordinates. Every chunk has its
+    # own generator so any chunk can be rebuilt without its predecessors.
+    rng = random.Random(f"{seed}:chunk:{index}")
+    left = index * CHUNK_WIDTH
+    color = CHUNK_COLORS[index // CHUNKS_PER_THEME % len(CHUNK_COLORS)]
+    ground_y = SCREEN_HEIGHT - 40
+
+    # Ground, with one jumpable gap after the safe stretch
+    segments = [(0, CHUNK_WIDTH)]
+    if index > 0 and rng.random() < 0.6:
+        gap_width = rng.randrange(60, 121, 20)
+        gap_x = rng.randrange(CHUNK_SAFE_WIDTH, CHUNK_WIDTH - gap_width - 100, 10)
+        segments = [(0, gap_x), (gap_x + gap_width, CHUNK_WIDTH)]
+    platforms = array("i")
+    for start, end in segments:
+        platforms.extend((left + start, ground_y, end - start, 40, *color))
+
+    # Floating platforms with coins above them
+    coins = array("i")
+    for _ in range(rng.randint(1, 3)):
+        width = rng.choice((100, 150, 200))
+        x = left + rng.randrange(50, CHUNK_WIDTH - width, 10)
+        y = rng.choice((380, 420, 460))
+        platforms.extend((x, y, width, 20, *color))
+        for i in range(rng.randint(0, 3)):
+            coins.extend((x + 20 + i * 40, y - 30))
+
+    # Enemies patrol ground segments long enough to walk on, never the
+    # first chunk where the player starts
+    enemies = array("i")
+    if index > 0:
+        for _ in range(rng.randint(0, 2)):
+            start, end = rng.choice(segments)
+            low = max(start, CHUNK_SAFE_WIDTH)
+            if end - start < 200 or end - 30 - low < 10:
+                continue
+            x = left + rng.randrange(low, end - 30, 10)
+            enemies.extend((x, ground_y - 30, left + start, left + end))
+    return {"platforms": platforms, "coins": coins, "enemies": enemies}
+
+class StreamingLevel(Level):
+    # Endless level made of generated chunks. Chunks are built ahead of a
+    # scrolling camera and dropped behind it, so memory and update cost stay
+    # constant however far the player runs. Sprites use world coordinates
+    # and are drawn offset by camera_x.
+    def __init__(self, player_lives, campaign_seed=None):
+        super().__init__(0, player_lives, campaign_seed=campaign_seed)
+
+    def create_level(self, level_number, level_file=None):
+        self.level_data = None
+        self.background_color = SKY_BLUE
+        self.has_clouds = True
+        self.camera_x = 0
+        self.chunks = deque()  # (index, platforms, coins, enemies) per loaded chunk
+        self.coin_roster = []
+        self.enemy_roster = []
+        self.build_spatial_index()
+        self.stream()
+
+    @property
+    def distance(self):
+        return self.player.rect.x // 10
+
+    def load_chunk(self, index):
+        data = generate_chunk(self.seed, index)
+        platforms = []
+        values = data["platforms"]
+        for i in range(0, len(values), 7):
+            x, y, width, height, r, g, b = values[i:i + 7]
+            platforms.append(self.platforms.add(x, y, width, height, (r, g, b)))
+        values = data["coins"]
+        coins = [self.coins.add(values[i], values[i + 1], *COIN_SIZE, COIN_COLOR)
+                 for i in range(0, len(values), 2)]
+        values = data["enemies"]
+        enemies = [self.enemies.add(values[i], values[i + 1], *ENEMY_SIZE, ENEMY_COLOR, speed=ENEMY_SPEED,
+                                    min_x=values[i + 2], max_x=values[i + 3])
+                   for i in range(0, len(values), 4)]
+        for platform in platforms:
+            self.platform_grid.insert(platform)
+        for coin in coins:
+            self.coin_grid.insert(coin)
+        for enemy in enemies:
+            self.enemy_grid.insert(enemy)
+        self.chunks.append((index, platforms, coins, enemies))
+        self.coin_roster += coins
+        self.enemy_roster += enemies
+
+    def unload_chunk(self):
+        index, platforms, coins, enemies = self.chunks.popleft()
+        for platform in platforms:
+            self.platform_grid.remove(platform)
+            self.platforms.release(platform.index)
+        for coin in coins:
+            self.coin_grid.remove(coin)
+            self.coins.release(coin.index)
+        for enemy in enemies:
+            self.enemy_grid.remove(enemy)
+            self.enemies.release(enemy.index)
+        del self.coin_roster[:len(coins)]
+        del self.enemy_roster[:len(enemies)]
+
+    def stream(self):
+        # Generate chunks ahead of the view, drop the ones far behind it and
+        # move the world bounds to the loaded span
+        while not self.chunks or (self.chunks[-1][0] + 1) * CHUNK_WIDTH < (
+                self.camera_x + SCREEN_WIDTH + CHUNKS_AHEAD * CHUNK_WIDTH):
+            self.load_chunk(self.chunks[-1][0] + 1 if self.chunks else 0)
+        while (self.chunks[0][0] + 1) * CHUNK_WIDTH < self.camera_x - CHUNKS_BEHIND * CHUNK_WIDTH:
+            self.unload_chunk()
+        self.player.min_x = self.chunks[0][0] * CHUNK_WIDTH
+        self.player.max_x = (self.chunks[-1][0] + 1) * CHUNK_WIDTH
+
+    def follow_player(self):
+        self.camera_x = max(self.player.min_x, self.player.rect.centerx - CAMERA_LEAD)
+        # Respawn at the safe start of whichever chunk the player is in
+        self.player.spawn_x = self.player.rect.centerx // CHUNK_WIDTH * CHUNK_WIDTH + 50
+
+    def chunks_in(self, left, right):
+        # Loaded chunks overlapping the world span [left, right)
+        for chunk in self.chunks:
+            if chunk[0] * CHUNK_WIDTH < right and (chunk[0] + 1) * CHUNK_WIDTH > left:
+                yield chunk
+
+    def active_enemies(self):
+        # Enemies sleep until their chunk comes within ACTIVE_MARGIN of the
+        # view, so the cost per tick follows what is near the camera
+        active = []
+        left = self.camera_x - ACTIVE_MARGIN
+        for chunk in self.chunks_in(left, left + SCREEN_WIDTH + 2 * ACTIVE_MARGIN):
+            active += [enemy for enemy in chunk[3] if enemy.alive()]
+        return active
+
+    def remember_positions(self):
+        super().remember_positions()
+        self.previous_positions["camera"] = (self.camera_x, 0)
+
+    def step(self, inputs, dt=1):
+        status = super().step(inputs, dt)
+        if status != "playing":
+            return status
+
+        # Falling into a gap costs a life
+        if self.player.rect.top > SCREEN_HEIGHT:
+            self.player.lives -= 1
+            self.player.reset_position()
+            if self.player.lives <= 0:
+                return "game_over"
+        self.follow_player()
+        self.stream()
+        return "playing"
+
+    def clone(self):
+        level = StreamingLevel(self.player.lives, self.campaign_seed)
+        level.profiler = self.profiler
+        level.restore(self.snapshot())
+        return level
+
+    def snapshot(self):
+        # STREAM_STATE_FIELDS values (camera, respawn x and the loaded chunk
+        # span) followed by Level.snapshot() of the loaded chunks
+        state = array("d", (self.camera_x, self.player.spawn_x, self.chunks[0][0], len(self.chunks)))
+        state.extend(super().snapshot())
+        return state
+
+    def restore(self, state):
+        # Rebuild the loaded chunks from scratch so grid order matches a
+        # level that streamed them in naturally
+        self.camera_x = int(state[0])
+        self.player.spawn_x = int(state[1])
+        first = int(state[2])
+        while self.chunks:
+            self.unload_chunk()
+        self.build_spatial_index()
+        for index in range(first, first + int(state[3])):
+            self.load_chunk(index)
+        self.player.min_x = first * CHUNK_WIDTH
+        self.player.max_x = (first + int(state[3])) * CHUNK_WIDTH
+        super().restore(state[STREAM_STATE_FIELDS:])
+
+    def cloud_positions(self, camera_x=None):
+        # Clouds scroll at a quarter of the camera speed for parallax
+        if not self.show_clouds:
+            return []
+        if camera_x is None:
+            camera_x = self.camera_x
+        offset = pygame.time.get_ticks() // 100 - camera_x // 4
+        return [((i * 200 + offset) % (SCREEN_WIDTH + 200) - 100, 50 + i * 30) for i in range(5)]
+
+    def draw(self, screen, alpha=1.0):
+        # Everything scrolls, so every frame is a full redraw. Between steps
+        # the camera and moving sprites are interpolated.
+        camera_x = self.interpolate("camera", self.camera_x, 0, alpha)[0]
+        screen.fill(self.background_color)
+        for x, y in self.cloud_positions(camera_x):
+            pygame.draw.ellipse(screen, WHITE, (x, y, 100, 40))
+            pygame.draw.ellipse(screen, WHITE, (x + 20, y - 20, 80, 40))
+            pygame.draw.ellipse(screen, WHITE, (x + 40, y + 10, 60, 40))
+        # Only sprites inside the view are blitted
+        view = pygame.Rect(camera_x, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        for index, platforms, coins, enemies in self.chunks_in(view.left, view.right):
+            for sprites in (platforms, coins, enemies):
+                for sprite in sprites:
+                    rect = sprite.rect
+                    if sprite.alive() and view.colliderect(rect):
+                        x, y = self.interpolate(sprite, rect.x, rect.y, alpha)
+                        screen.blit(sprite.image, (x - camera_x, y))
+        rect = self.player.rect
+        x, y = self.interpolate(self.player, rect.x, rect.y, alpha)
+        screen.blit(self.player.image, (x - camera_x, y))
+
+        distance_text = render_text(f"Distance: {self.distance}", WHITE, 36)
+        screen.blit(distance_text, (10, 10))
+        score_text = render_text(f"Score: {self.score}", WHITE, 36)
+        screen.blit(score_text, (10, 50))
+        lives_text = render_text(f"Lives: {self.player.lives}", WHITE, 36)
         screen.blit(lives_text, (10, 90))
-        
-        pygame.display.flip()
+
+    def draw_dirty(self, screen, alpha=1.0):
+        self.draw(screen, alpha)
+        return [screen.get_rect()]
+
+class LevelCache:
+    # LRU pool of prebuilt level templates keyed by (level number, campaign
+    # seed). Templates are never played; get() hands out clones. prefetch()
+    # builds templates on a background thread ahead of time, and progress()
+    # reports how far along a build is.
+    def __init__(self, capacity=LEVEL_CACHE_SIZE):
+        self.capacity = capacity
+        self.templates = OrderedDict()
+        self.pending = {}
+        self.stages = {}  # Build stages finished per pending key
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-cache")
+
+    def build(self, level_number, campaign_seed):
+        key = (level_number, campaign_seed)
+        level = Level(level_number, 3, campaign_seed=campaign_seed)
+        self.finish_stage(key)
+        if pygame.display.get_surface() is not None:
+            level.build_static_layers()
+        self.finish_stage(key)
+        get_font(None, 36)  # The HUD font
+        with self.lock:
+            self.pending.pop(key, None)
+            self.stages.pop(key, None)
+            self.store(key, level)
+        return level
+
+    def finish_stage(self, key):
+        with self.lock:
+            self.stages[key] = self.stages.get(key, 0) + 1
+
+    def store(self, key, level):
+        self.templates[key] = level
+        self.templates.move_to_end(key)
+        while len(self.templates) > self.capacity:
+            self.templates.popitem(last=False)
+
+    def template(self, level_number, campaign_seed):
+        key = (level_number, campaign_seed)
+        with self.lock:
+            level = self.templates.get(key)
+            if level is not None:
+                self.templates.move_to_end(key)
+                return level
+            future = self.pending.get(key)
+        if future is not None:
+            return future.result()
+        return self.build(level_number, campaign_seed)
+
+    def progress(self, level_number, campaign_seed):
+        # Fraction of the level's template built so far, 1.0 once get() will
+        # not block. Failed builds also count as done and raise from get().
+        key = (level_number, campaign_seed)
+        with self.lock:
+            if key in self.templates:
+                return 1.0
+            future = self.pending.get(key)
+            if future is None or future.done():
+                return 0.0 if future is None else 1.0
+            return self.stages.get(key, 0) / LEVEL_LOAD_STAGES
+
+    def get(self, level_number, player_lives, campaign_seed):
+        level = self.template(level_number, campaign_seed).clone()
+        level.player.lives = player_lives
+        return level
+
+    def prefetch(self, level_numbers, campaign_seed):
+        for level_number in level_numbers:
+            key = (level_number, campaign_seed)
+            with self.lock:
+                if key in self.templates or key in self.pending:
+                    continue
+                self.pending[key] = self.executor.submit(self.build, level_number, campaign_seed)
+
+def run_headless(level_number, inputs, player_lives=3, observer=None, campaign_seed=None):
+    # Play a level from a sequence of input vectors without opening a display.
+    # The optional observer is called with the level after every tick, e.g.
+    # to render or record it.
+    level = Level(level_number, player_lives, campaign_seed=campaign_seed)
+    status = "playing"
+    for inputs_this_tick in inputs:
+        status = level.step(inputs_this_tick)
+        if observer is not None:
+            observer(level)
+        if status != "playing":
+            break
+    return status, level
+
+@lru_cache(maxsize=None)
+def jump_envelope():
+    # Simulate one standing jump with the real Player physics and tabulate it
+    # relative to the takeoff height (negative offsets are higher up). The
+    # jump starts far below the screen: Rect rounds halves away from zero,
+    # so a jump through negative y would rise a pixel more on some ticks.
+    # landing_reach maps a landing height to the widest horizontal gap that
+    # can be crossed to land there, body_reach maps a height the player's
+    # body can touch while above the takeoff to the widest drift available
+    player = Player(0, 10 * SCREEN_HEIGHT)
+    empty = SpatialGrid()
+    takeoff = player.rect.bottom
+    player.on_ground = True
+    player.jump()
+    bottoms = [0]
+    while bottoms[-1] < SCREEN_HEIGHT:
+        player.update(empty)
+        bottoms.append(player.rect.bottom - takeoff)
+
+    landing_reach = {}
+    body_reach = {}
+    for tick in range(1, len(bottoms)):
+        drift = PLAYER_SPEED * tick
+        if bottoms[tick] > bottoms[tick - 1]:
+            # Descending: lands on tops between the previous and this bottom
+            for height in range(bottoms[tick - 1], bottoms[tick]):
+                landing_reach[height] = drift
+        if bottoms[tick] <= 0:
+            for height in range(bottoms[tick] - player.rect.height, bottoms[tick]):
+                body_reach[height] = max(body_reach.get(height, 0), drift)
+    return landing_reach, body_reach, player.rect.size
+
+def jump_graph(platforms):
+    # For each platform rect, the indexes of the platforms one jump from it
+    # can land on. A player standing on a platform has its left edge
+    # anywhere in [left - width + 1, right - 1].
+    landing_reach, _, (width, _) = jump_envelope()
+    graph = []
+    for a_index, a in enumerate(platforms):
+        targets = []
+        for b_index, b in enumerate(platforms):
+            reach = landing_reach.get(b.top - a.top)
+            if reach is None or b_index == a_index:
+                continue
+            gap = max(b.left - width + 1 - (a.right - 1), a.left - width + 1 - (b.right - 1), 0)
+            if gap <= reach:
+                targets.append(b_index)
+        graph.append(targets)
+    return graph
+
+def touchable_from(item, platform):
+    # Whether the player can touch the item rect while standing on or
+    # jumping from the platform rect
+    _, body_reach, (width, _) = jump_envelope()
+    if item.top - platform.top >= 0:
+        return False  # Not above this platform
+    drift = body_reach.get(min(item.bottom - 1 - platform.top, -1))
+    if drift is None:
+        return False  # Too high
+    return item.left < platform.right - 1 + drift + width and item.right > platform.left - width + 1 - drift
+
+def analyze_level(level):
+    # Check a built level against the jump envelope instead of simulating
+    # it: which platforms can be stood on starting from the spawn point,
+    # and whether the goal and each coin can be touched from one of them.
+    # Walls and ceilings along a jump are not considered, so the result is
+    # what the jump physics allow in open space.
+    _, _, (width, height) = jump_envelope()
+    platforms = [platform.rect for platform in level.platforms]
+    graph = jump_graph(platforms)
+
+    # The player drops from the spawn point onto the first platform below
+    spawn = pygame.Rect(Player.spawn_x, Player.spawn_y, width, height)
+    below = [i for i, rect in enumerate(platforms)
+             if rect.left < spawn.right and rect.right > spawn.left and rect.top >= spawn.bottom]
+    reachable = set()
+    queue = deque()
+    if below:
+        start = min(below, key=lambda i: platforms[i].top)
+        reachable.add(start)
+        queue.append(start)
+    while queue:
+        for index in graph[queue.popleft()]:
+            if index not in reachable:
+                reachable.add(index)
+                queue.append(index)
+
+    def touchable(item):
+        return any(touchable_from(item, platforms[index]) for index in reachable)
+
+    coins = [coin.rect for coin in level.coin_roster]
+    goals = [goal.rect for goal in level.goals]
+    return {
+        "level": level.level_number,
+        "seed": level.campaign_seed,
+        "platforms": len(platforms),
+        "reachable_platforms": len(reachable),
+        "goal": all(touchable(goal) for goal in goals) if goals else None,
+        "coins": len(coins),
+        "unreachable_coins": [tuple(coin.topleft) for coin in coins if not touchable(coin)],
+        "embedded_coins": [tuple(coin.topleft) for coin in coins if coin.collidelist(platforms) != -1],
+    }
+
+# Status codes used by BatchLevels, indexing the scalar status strings
+BATCH_PLAYING = 0
+BATCH_COMPLETED = 1
+BATCH_GAME_OVER = 2
+BATCH_STATUSES = ("playing", "completed", "game_over")
+
+def _overlaps(ax, ay, aw, ah, bx, by, bw, bh):
+    # Vectorized pygame.Rect.colliderect
+    return (ax < bx + bw) & (bx < ax + aw) & (ay < by + bh) & (by < ay + ah)
+
+def _rect_round(values):
+    # pygame.Rect rounds float coordinates half away from zero
+    return (np.sign(values) * np.floor(np.abs(values) + 0.5)).astype(np.int64)
+
+def _pack_rects(groups):
+    # Pack one sprite Group per level into padded (N, M) coordinate arrays
+    # plus a validity mask, keeping each Group's iteration order
+    count = len(groups)
+    width = max([len(group) for group in groups] + [1])
+    packed = np.zeros((5, count, width), dtype=np.int64)
+    for i, group in enumerate(groups):
+        for j, sprite in enumerate(group):
+            packed[:, i, j] = (sprite.rect.x, sprite.rect.y, sprite.rect.width, sprite.rect.height, 1)
+    x, y, w, h, valid = packed
+    return x, y, w, h, valid.astype(bool)
+
+class BatchLevels:
+    # Steps N independent levels in lockstep with the same physics as
+    # Level.step, holding all state in NumPy arrays. Levels that finish are
+    # frozen with their final status until the batch is rebuilt.
+    def __init__(self, levels):
+        if np is None:
+            raise RuntimeError("BatchLevels requires NumPy")
+        self.count = len(levels)
+        self.player_w, self.player_h = levels[0].player.rect.size
+
+        # Player state
+        self.x = np.array([level.player.rect.x for level in levels], dtype=np.int64)
+        self.y = np.array([level.player.rect.y for level in levels], dtype=np.int64)
+        self.vel_x = np.array([level.player.vel_x for level in levels], dtype=np.int64)
+        self.vel_y = np.array([level.player.vel_y for level in levels], dtype=np.float64)
+        self.on_ground = np.array([level.player.on_ground for level in levels], dtype=bool)
+        self.lives = np.array([level.player.lives for level in levels], dtype=np.int64)
+        self.score = np.array([level.score for level in levels], dtype=np.int64)
+        self.ticks = np.array([level.ticks for level in levels], dtype=np.int64)
+        self.status = np.full(self.count, BATCH_PLAYING, dtype=np.int8)
+
+        # Level contents
+        self.plat_x, self.plat_y, self.plat_w, self.plat_h, self.plat_valid = _pack_rects(
+            [level.platforms for level in levels])
+        self.coin_x, self.coin_y, self.coin_w, self.coin_h, self.coin_alive = _pack_rects(
+            [level.coins for level in levels])
+        self.goal_x, self.goal_y, self.goal_w, self.goal_h, self.goal_valid = _pack_rects(
+            [level.goals for level in levels])
+        self.enemy_x, self.enemy_y, self.enemy_w, self.enemy_h, self.enemy_alive = _pack_rects(
+            [level.enemies for level in levels])
+        self.enemy_dir = np.ones_like(self.enemy_x)
+        self.enemy_speed = np.zeros_like(self.enemy_x)
+        for i, level in enumerate(levels):
+            for j, enemy in enumerate(level.enemies):
+                self.enemy_dir[i, j] = enemy.direction
+                self.enemy_speed[i, j] = enemy.speed
+
+    def step(self, inputs, dt=1):
+        # Advance every unfinished level by dt ticks in one physics step, like
+        # Level.step. inputs is one input vector per level (or a single one
+        # broadcast to all of them).
+        inputs = np.broadcast_to(np.asarray(inputs, dtype=np.int64), (self.count,))
+        rows = np.flatnonzero(self.status == BATCH_PLAYING)
+        if rows.size == 0:
+            return self.status
+        inputs = inputs[rows]
+        pw, ph = self.player_w, self.player_h
+        x = self.x[rows]
+        y = self.y[rows]
+        vel_y = self.vel_y[rows]
+        on_ground = self.on_ground[rows]
+        plat_x = self.plat_x[rows]
+        plat_y = self.plat_y[rows]
+        plat_w = self.plat_w[rows]
+        plat_h = self.plat_h[rows]
+        plat_valid = self.plat_valid[rows]
+        index = np.arange(rows.size)
+
+        # Player input
+        vel_y = np.where((inputs & INPUT_JUMP != 0) & on_ground, float(JUMP_STRENGTH), vel_y)
+        vel_x = np.where(inputs & INPUT_LEFT != 0, -PLAYER_SPEED,
+                         np.where(inputs & INPUT_RIGHT != 0, PLAYER_SPEED, 0))
+
+        # Apply gravity and move horizontally
+        vel_y = vel_y + GRAVITY * dt
+        start_x = x
+        x = x + vel_x * dt
+
+        # Swept horizontal collisions as in Player.update: the nearest edge
+        # crossed by the move stops it
+        plat_right = plat_x + plat_w
+        swept = plat_valid & _overlaps(np.minimum(start_x, x)[:, None], y[:, None],
+                                       (np.abs(x - start_x) + pw)[:, None], ph,
+                                       plat_x, plat_y, plat_w, plat_h)
+        right = swept & (vel_x > 0)[:, None] & (plat_x >= (start_x + pw)[:, None])
+        left = swept & (vel_x < 0)[:, None] & (plat_right <= start_x[:, None])
+        crossed_right = right.any(axis=1)
+        crossed_left = left.any(axis=1)
+        x = np.where(crossed_right, np.where(right, plat_x, np.iinfo(np.int64).max).min(axis=1) - pw,
+                     np.where(crossed_left, np.where(left, plat_right, np.iinfo(np.int64).min).max(axis=1), x))
+        # Otherwise platforms already overlapped push the player out one at
+        # a time in level order, each tested against the position so far
+        pending = (vel_x != 0) & ~crossed_right & ~crossed_left
+        for column in range(plat_x.shape[1]):
+            hit = pending & swept[:, column] & _overlaps(x, y, pw, ph, plat_x[:, column], plat_y[:, column],
+                                                         plat_w[:, column], plat_h[:, column])
+            x = np.where(hit & (vel_x > 0), plat_x[:, column] - pw,
+                         np.where(hit & (vel_x < 0), plat_right[:, column], x))
+
+        # Move vertically with the same swept resolution
+        start_y = y
+        y = _rect_round(y + vel_y * dt)
+        plat_bottom = plat_y + plat_h
+        swept = plat_valid & _overlaps(x[:, None], np.minimum(start_y, y)[:, None], pw,
+                                       (np.abs(y - start_y) + ph)[:, None], plat_x, plat_y, plat_w, plat_h)
+        down = swept & (vel_y > 0)[:, None] & (plat_y >= (start_y + ph)[:, None])
+        up = swept & (vel_y < 0)[:, None] & (plat_bottom <= start_y[:, None])
+        landed = down.any(axis=1)
+        bumped = up.any(axis=1)
+        y = np.where(landed, np.where(down, plat_y, np.iinfo(np.int64).max).min(axis=1) - ph,
+                     np.where(bumped, np.where(up, plat_bottom, np.iinfo(np.int64).min).max(axis=1), y))
+        # Otherwise the first overlapped platform zeroes vel_y, so it alone counts
+        hits = swept & ~(landed | bumped)[:, None] & _overlaps(
+            x[:, None], y[:, None], pw, ph, plat_x, plat_y, plat_w, plat_h)
+        hit = hits.any(axis=1)
+        first = np.argmax(hits, axis=1)
+        falling = hit & (vel_y > 0)
+        jumping = hit & (vel_y < 0)
+        y = np.where(falling, plat_y[index, first] - ph,
+                     np.where(jumping, plat_bottom[index, first], y))
+        on_ground = landed | falling
+        vel_y = np.where(landed | bumped | falling | jumping, 0.0, vel_y)
+
+        # Keep player on screen
+        x = np.clip(x, 0, SCREEN_WIDTH - pw)
+
+        # Enemies walk and turn at walls and platform edges
+        alive = self.enemy_alive[rows]
+        enemy_x = self.enemy_x[rows]
+        enemy_y = self.enemy_y[rows]
+        enemy_w = self.enemy_w[rows]
+        enemy_h = self.enemy_h[rows]
+        speed = self.enemy_speed[rows] * dt
+        direction = self.enemy_dir[rows]
+        enemy_x = np.where(alive, enemy_x + speed * direction, enemy_x)
+        at_wall = alive & ((enemy_x + enemy_w >= SCREEN_WIDTH) | (enemy_x <= 0))
+        direction = np.where(at_wall, -direction, direction)
+        test_x = enemy_x + speed * direction
+        supported = (plat_valid[:, None, :] & _overlaps(
+            test_x[:, :, None], enemy_y[:, :, None] + 5, enemy_w[:, :, None], enemy_h[:, :, None],
+            plat_x[:, None, :], plat_y[:, None, :], plat_w[:, None, :], plat_h[:, None, :])).any(axis=2)
+        direction = np.where(alive & ~supported, -direction, direction)
+
+        # Check for coin collisions
+        coin_alive = self.coin_alive[rows]
+        coin_hits = coin_alive & _overlaps(x[:, None], y[:, None], pw, ph, self.coin_x[rows],
+                                           self.coin_y[rows], self.coin_w[rows], self.coin_h[rows])
+        coin_alive &= ~coin_hits
+        score = self.score[rows] + 10 * coin_hits.sum(axis=1)
+
+        # Check for enemy collisions, one enemy column at a time so stomps,
+        # bounces and resets affect later hits exactly like the scalar loop
+        lives = self.lives[rows]
+        status = np.full(rows.size, BATCH_PLAYING, dtype=np.int8)
+        enemy_hits = alive & _overlaps(x[:, None], y[:, None], pw, ph, enemy_x, enemy_y, enemy_w, enemy_h)
+        for column in np.flatnonzero(enemy_hits.any(axis=0)):
+            hit = enemy_hits[:, column] & (status == BATCH_PLAYING)
+            centery = enemy_y[:, column] + enemy_h[:, column] // 2
+            stomp = hit & (vel_y > 0) & (y + ph < centery)
+            hurt = hit & ~stomp
+            alive[:, column] &= ~stomp
+            vel_y = np.where(stomp, JUMP_STRENGTH / 2, vel_y)
+            score = score + 100 * stomp
+            lives = lives - hurt
+            x = np.where(hurt, 100, x)
+            y = np.where(hurt, 300, y)
+            vel_x = np.where(hurt, 0, vel_x)
+            vel_y = np.where(hurt, 0.0, vel_y)
+            status[hurt & (lives <= 0)] = BATCH_GAME_OVER
+
+        # Check if player reached the goal
+        goal_hits = self.goal_valid[rows] & _overlaps(x[:, None], y[:, None], pw, ph, self.goal_x[rows],
+                                                      self.goal_y[rows], self.goal_w[rows], self.goal_h[rows])
+        status[(status == BATCH_PLAYING) & goal_hits.any(axis=1)] = BATCH_COMPLETED
+
+        self.x[rows] = x
+        self.y[rows] = y
+        self.vel_x[rows] = vel_x
+        self.vel_y[rows] = vel_y
+        self.on_ground[rows] = on_ground
+        self.lives[rows] = lives
+        self.score[rows] = score
+        self.ticks[rows] += dt
+        self.status[rows] = status
+        self.coin_alive[rows] = coin_alive
+        self.enemy_alive[rows] = alive
+        self.enemy_x[rows] = enemy_x
+        self.enemy_dir[rows] = direction
+        return self.status
+
+class FrameProfiler:
+    # Opt-in frame instrumentation: per-phase timings in milliseconds and
+    # per-frame counters, rolling p50/p95/p99 for an on-screen overlay, and
+    # an optional full trace for CSV or JSON export
+    def __init__(self, keep_trace=False, window=PROFILE_WINDOW):
+        self.window = window
+        self.keep_trace = keep_trace
+        self.samples = {}
+        self.trace = []
+        self.frame_index = 0
+        self.timings = {}
+        self.counters = {}
+        self.frame_start = 0.0
+        self.blocks = 0
+        self.overlay_lines = []
+
+    def begin_frame(self):
+        self.timings = {}
+        self.counters = {}
+        self.blocks = sys.getallocatedblocks()
+        self.frame_start = perf_counter()
+        return self.frame_start
+
+    def add(self, phase, start):
+        # Charge the time since start to phase and return the current time
+        now = perf_counter()
+        self.timings[phase] = self.timings.get(phase, 0.0) + (now - start) * 1000
+        return now
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def end_frame(self):
+        self.timings["frame"] = (perf_counter() - self.frame_start) * 1000
+        # Net change in allocated memory blocks over the frame
+        self.counters["alloc_blocks"] = sys.getallocatedblocks() - self.blocks
+        for name, value in list(self.timings.items()) + list(self.counters.items()):
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(value)
+        if self.keep_trace:
+            self.trace.append((self.frame_index, self.timings, self.counters))
+        self.frame_index += 1
+
+    def percentiles(self, name):
+        values = sorted(self.samples[name])
+        last = len(values) - 1
+        return [values[int(last * q)] for q in (0.5, 0.95, 0.99)]
+
+    def draw_overlay(self, screen):
+        # Draw the rolling percentiles in an opaque box so the box fully
+        # repaints its own area; returns that area
+        if not self.overlay_lines or self.frame_index % PROFILE_OVERLAY_REFRESH == 0:
+            self.overlay_lines = ["phase              p50    p95    p99"]
+            for name in sorted(self.samples):
+                p50, p95, p99 = self.percentiles(name)
+                self.overlay_lines.append(f"{name:<16}{p50:>7.2f}{p95:>7.2f}{p99:>7.2f}")
+        box = pygame.Rect(SCREEN_WIDTH - 330, 0, 330, 8 + 18 * len(self.overlay_lines))
+        screen.fill(BLACK, box)
+        for i, line in enumerate(self.overlay_lines):
+            screen.blit(render_text(line, WHITE, 20, "monospace"), (box.x + 6, 4 + 18 * i))
+        return box
+
+    def export(self, path):
+        # Write the recorded trace as JSON (for .json paths) or CSV
+        timing_names = sorted({name for _, timings, _ in self.trace for name in timings})
+        counter_names = sorted({name for _, _, counters in self.trace for name in counters})
+        with open(path, "w", newline="") as f:
+            if path.endswith(".json"):
+                json.dump([{"frame": index, "timings_ms": timings, "counters": counters}
+                           for index, timings, counters in self.trace], f)
+                return
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + [f"{name}_ms" for name in timing_names] + counter_names)
+            for index, timings, counters in self.trace:
+                writer.writerow([index] + [round(timings.get(name, 0.0), 4) for name in timing_names]
+                                + [counters.get(name, 0) for name in counter_names])
+
+# Game commands, shared by live input and replays
+CMD_TICKS = 0
+CMD_MOVE = 1
+CMD_ENTER = 2
+CMD_EXIT = 3
+CMD_RESTART = 4
+DIRECTIONS = ("right", "left", "down", "up")
+OVERWORLD_KEYS = {pygame.K_RIGHT: 0, pygame.K_LEFT: 1, pygame.K_DOWN: 2, pygame.K_UP: 3}
+
+# Replay files: a header, then fixed-size records where runs of identical
+# level inputs are stored as one CMD_TICKS record and a CMD_RESTART record
+# is followed by the new campaign seed
+REPLAY_MAGIC = b"DMRP"
+REPLAY_VERSION = 2  # 2: overworld moves pick paths by angle
+REPLAY_HEADER = struct.Struct("<4sHxxQ")  # Magic, version, campaign seed
+REPLAY_RECORD = struct.Struct("<BBH")  # Command, argument, tick count
+REPLAY_SEED = struct.Struct("<Q")
+REPLAY_SEED_LIMIT = 2 ** (8 * REPLAY_SEED.size)  # Campaign seeds must be below this to be recorded
+REPLAY_MAX_RUN = 0xFFFF
+
+class ReplayRecorder:
+    def __init__(self, campaign_seed):
+        self.data = bytearray(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, campaign_seed))
+        self.run_inputs = 0
+        self.run_length = 0
+
+    def flush(self):
+        if self.run_length:
+            self.data += REPLAY_RECORD.pack(CMD_TICKS, self.run_inputs, self.run_length)
+            self.run_length = 0
+
+    def record_tick(self, inputs):
+        if self.run_length and (inputs != self.run_inputs or self.run_length == REPLAY_MAX_RUN):
+            self.flush()
+        self.run_inputs = inputs
+        self.run_length += 1
+
+    def record_command(self, code, argument=0):
+        self.flush()
+        if code == CMD_RESTART:
+            self.data += REPLAY_RECORD.pack(code, 0, 0) + REPLAY_SEED.pack(argument)
+        else:
+            self.data += REPLAY_RECORD.pack(code, argument, 0)
+
+    def getvalue(self):
+        self.flush()
+        return bytes(self.data)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.getvalue())
+
+def parse_replay(data):
+    # Returns the starting campaign seed and a list of (command, argument,
+    # count) records; for CMD_RESTART the argument is the new seed
+    magic, version, campaign_seed = REPLAY_HEADER.unpack_from(data, 0)
+    if magic != REPLAY_MAGIC:
+        raise ValueError("not a replay file")
+    if version != REPLAY_VERSION:
+        raise ValueError(f"unsupported replay version {version}")
+    records = []
+    offset = REPLAY_HEADER.size
+    while offset < len(data):
+        code, argument, count = REPLAY_RECORD.unpack_from(data, offset)
+        offset += REPLAY_RECORD.size
+        if code == CMD_RESTART:
+            argument, = REPLAY_SEED.unpack_from(data, offset)
+            offset += REPLAY_SEED.size
+        records.append((code, argument, count))
+    return campaign_seed, records
+
+class ReplayPlayer:
+    # Re-runs a recorded session on a headless Game as fast as possible.
+    # With snapshot_interval set, the game state is saved every N level
+    # ticks so seek() only has to re-simulate from the nearest snapshot.
+    def __init__(self, data, snapshot_interval=0):
+        self.campaign_seed, self.records = parse_replay(data)
+        self.snapshot_interval = snapshot_interval
+        self.game = Game(headless=True, campaign_seed=self.campaign_seed)
+        self.position = 0  # Next record
+        self.offset = 0  # Ticks already played from the current record
+        self.tick = 0
+        self.snapshots = []
+
+    def advance(self, until_tick=None):
+        # Play records until the end, or until until_tick level ticks have run
+        game = self.game
+        records = self.records
+        while self.position < len(records):
+            code, argument, count = records[self.position]
+            if code == CMD_TICKS:
+                while self.offset < count:
+                    if until_tick is not None and self.tick >= until_tick:
+                        return self.tick
+                    if self.snapshot_interval and self.tick % self.snapshot_interval == 0 and (
+                            not self.snapshots or self.snapshots[-1][0] < self.tick):
+                        self.snapshots.append((self.tick, self.position, self.offset, game.snapshot()))
+                    game.step_level(argument)
+                    self.tick += 1
+                    self.offset += 1
+                self.offset = 0
+            else:
+                if until_tick is not None and self.tick >= until_tick:
+                    return self.tick
+                game.apply_command(code, argument)
+            self.position += 1
+        return self.tick
+
+    def run(self):
+        self.advance()
+        return self.game
+
+    def seek(self, tick):
+        # Jump to the state right after the given number of level ticks
+        start = None
+        for snapshot in self.snapshots:
+            if snapshot[0] <= tick:
+                start = snapshot
+        if start is not None and (tick < self.tick or start[0] > self.tick):
+            self.tick, self.position, self.offset, state = start
+            self.game.restore(state)
+        elif tick < self.tick:
+            self.game.reset(self.campaign_seed)
+            self.tick = self.position = self.offset = 0
+        return self.advance(tick)
+
+# Game.snapshot() layout
+GAME_STATES = ("overworld", "level", "game_over", "victory")
+GAME_STATE_FIELDS = 8
 
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Super Mario Bros 3-like Game")
+    def __init__(self, dirty_rects=False, campaign_seed=None, headless=False, replay_path=None,
+                 profile=False, trace_path=None, endless=False, report_startup=False,
+                 physics_rate=PHYSICS_RATE):
+        # Time each startup phase; with report_startup the breakdown is
+        # printed after the first frame and the game exits
+        self.startup = OrderedDict()
+        self.report_startup = report_startup
+        start = perf_counter()
+        self.dirty_rects = dirty_rects  # Repaint only changed areas inside levels
+        self.endless = endless  # Play one endless streaming level instead of the campaign
+        self.seed_option = campaign_seed  # None picks a new campaign seed per game
+        self.headless = headless  # Simulation only, never opens a display
+        self.screen = None
+        if not headless:
+            init_display()
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("Super Mario Bros 3-like Game")
+            start = self.startup_phase("display", start)
         self.clock = pygame.time.Clock()
         self.running = True
+        # Fixed-rate physics: every step advances the level FPS // rate ticks,
+        # so game speed does not depend on the frame rate
+        self.physics_rate = physics_rate
+        self.physics_dt = FPS // physics_rate
+        self.frame_load = 0.0  # Smoothed share of the frame budget in use
+        self.low_quality = False  # Clouds are off while frames run over budget
+        # Frame profiling with an overlay, exported on exit if trace_path is set
+        self.trace_path = trace_path
+        self.profiler = None
+        if profile or trace_path:
+            self.profiler = FrameProfiler(keep_trace=bool(trace_path))
+        self.level_cache = LevelCache()
+        self.loading = None  # Level being loaded to enter, if any
+        self.reset()
+        self.startup_phase("overworld", start)
+        # Record every command and level tick when a replay file is requested
+        self.replay_path = replay_path
+        self.recorder = ReplayRecorder(self.campaign_seed) if replay_path else None
+
+    def startup_phase(self, phase, start):
+        now = perf_counter()
+        self.startup[phase] = now - start
+        return now
+
+    def print_startup(self):
+        print(f"{'import':<16}{(IMPORT_FINISHED - IMPORT_STARTED) * 1000:>9.1f} ms")
+        for phase, seconds in self.startup.items():
+            print(f"{phase:<16}{seconds * 1000:>9.1f} ms")
+        print(f"{'total':<16}{(perf_counter() - IMPORT_STARTED) * 1000:>9.1f} ms")
+
+    def prefetch_levels(self):
+        # Prepare the current node's level and its neighbours in the background
+        current = self.overworld.current_node
+        nodes = [current] + self.overworld.neighbors(current)
+        levels = [self.overworld.nodes[node]["level"] for node in nodes]
+        self.level_cache.prefetch(levels, self.campaign_seed)
+
+    def reset(self, campaign_seed=None):
+        self.campaign_seed = campaign_seed if campaign_seed is not None else self.seed_option
+        if self.campaign_seed is None:
+            self.campaign_seed = random.randrange(2 ** 32)
         self.total_score = 0
         self.state = "overworld"  # "overworld", "level", "game_over", "victory"
         self.overworld = OverworldMap()
         self.current_level = None
         self.player_lives = 3
         self.game_completed = False
+        self.loading = None
+        if self.endless:
+            self.current_level = StreamingLevel(self.player_lives, self.campaign_seed)
+            self.current_level.profiler = self.profiler
+            self.state = "level"
+        else:
+            self.prefetch_levels()
+
+    def snapshot(self):
+        # Flat copy of the game state: GAME_STATE_FIELDS values, the
+        # overworld snapshot, then the current level's snapshot if any. The
+        # seed is split into 32-bit halves since doubles round above 2**53.
+        level = self.current_level
+        state = array("d", (GAME_STATES.index(self.state), self.campaign_seed >> 32,
+                            self.campaign_seed & 0xFFFFFFFF, self.total_score, self.player_lives,
+                            self.game_completed, level.level_number if level is not None else 0, self.endless))
+        state.extend(self.overworld.snapshot())
+        if level is not None:
+            state.extend(level.snapshot())
+        return state
+
+    def restore(self, state):
+        self.state = GAME_STATES[int(state[0])]
+        self.campaign_seed = int(state[1]) << 32 | int(state[2])
+        self.total_score = int(state[3])
+        self.player_lives = int(state[4])
+        self.game_completed = bool(state[5])
+        level_number = int(state[6])
+        self.endless = bool(state[7])
+        overworld_size = 1 + 2 * len(self.overworld.nodes)
+        self.overworld.restore(state[GAME_STATE_FIELDS:GAME_STATE_FIELDS + overworld_size])
+        level = self.current_level
+        if self.endless:
+            # Endless levels are number 0 and always present
+            if not isinstance(level, StreamingLevel) or level.campaign_seed != self.campaign_seed:
+                level = self.current_level = StreamingLevel(self.player_lives, self.campaign_seed)
+                level.profiler = self.profiler
+        elif not level_number:
+            self.current_level = None
+            return
+        elif level is None or level.level_number != level_number or level.campaign_seed != self.campaign_seed:
+            level = self.current_level = self.level_cache.get(level_number, self.player_lives,
+                                                              self.campaign_seed)
+            level.profiler = self.profiler
+        level.restore(state[GAME_STATE_FIELDS + overworld_size:])
+
+    def command(self, code, argument=None):
+        # Apply a live command and record it for replays
+        self.apply_command(code, argument)
+        if self.recorder is not None:
+            if code == CMD_RESTART:
+                argument = self.campaign_seed
+            self.recorder.record_command(code, argument or 0)
+
+    def apply_command(self, code, argument=None):
+        if code == CMD_MOVE:
+            if self.overworld.move(DIRECTIONS[argument]):
+                self.prefetch_levels()
+        elif code == CMD_ENTER:
+            level_number = self.overworld.get_current_level()
+            self.current_level = self.level_cache.get(level_number, self.player_lives,
+                                                      self.campaign_seed)
+            self.current_level.profiler = self.profiler
+            self.state = "level"
+        elif code == CMD_EXIT:
+            if self.endless:
+                # Leaving an endless run ends it
+                self.total_score += self.current_level.score
+                self.state = "game_over"
+            else:
+                self.state = "overworld"
+        elif code == CMD_RESTART:
+            self.reset(argument)
         
     def handle_events(self):
         for event in pygame.event.get():
@@ -751,52 +2399,70 @@ class Game:
                 
             if self.state == "overworld":
                 if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_RIGHT:
-                        self.overworld.move("right")
-                    elif event.key == pygame.K_LEFT:
-                        self.overworld.move("left")
-                    elif event.key == pygame.K_DOWN:
-                        self.overworld.move("down")
-                    elif event.key == pygame.K_UP:
-                        self.overworld.move("up")
+                    if event.key in OVERWORLD_KEYS:
+                        self.loading = None  # Moving on cancels entering
+                        self.command(CMD_MOVE, OVERWORLD_KEYS[event.key])
                     elif event.key == pygame.K_RETURN:
-                        level_number = self.overworld.get_current_level()
-                        self.current_level = Level(level_number, self.player_lives)
-                        self.state = "level"
+                        # Enter once the level has loaded in the background
+                        self.loading = self.overworld.get_current_level()
             elif self.state == "level":
                 self.current_level.handle_events(event)
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                    self.state = "overworld"
+                    self.command(CMD_EXIT)
             elif self.state in ["game_over", "victory"]:
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_r:
-                        self.__init__()  # Reset game
+                        self.command(CMD_RESTART)  # Reset game
                     elif event.key == pygame.K_q:
                         self.running = False
     
     def update(self):
+        if self.loading is not None:
+            # Keep the overworld running until the level is ready, then swap
+            # it in with one command. prefetch() restarts an evicted build.
+            self.level_cache.prefetch([self.loading], self.campaign_seed)
+            if self.level_cache.progress(self.loading, self.campaign_seed) >= 1:
+                self.loading = None
+                self.command(CMD_ENTER)
         if self.state == "level":
-            level_status = self.current_level.update()
+            inputs = self.current_level.read_inputs()
+            if self.recorder is not None:
+                self.recorder.record_tick(inputs)
+            self.step_level(inputs)
+
+    def step_level(self, inputs):
+        if not self.headless:
+            self.current_level.remember_positions()
+        level_status = self.current_level.step(inputs, self.physics_dt)
+        
+        if level_status == "completed":
+            # Add level score to total
+            self.total_score += self.current_level.score
+            self.player_lives = self.current_level.player.lives
             
-            if level_status == "completed":
-                # Add level score to total
-                self.total_score += self.current_level.score
-                self.player_lives = self.current_level.player.lives
-                
-                # Mark level as completed in overworld and unlock connected nodes
-                self.overworld.complete_current_level()
+            # Mark level as completed in overworld and unlock connected nodes
+            self.overworld.complete_current_level()
+            self.prefetch_levels()
+            
+            # Check if this was the final level
+            if self.overworld.get_current_level() == 8:
+                self.state = "victory"
+                self.game_completed = True
+            else:
+                self.state = "overworld"
                 
-                # Check if this was the final level
-                if self.overworld.get_current_level() == 8:
-                    self.state = "victory"
-                    self.game_completed = True
-                else:
-                    self.state = "overworld"
-                    
-            elif level_status == "game_over":
-                self.state = "game_over"
+        elif level_status == "game_over":
+            if self.endless:
+                self.total_score += self.current_level.score
+            self.state = "game_over"
     
-    def draw(self):
+    def draw(self, alpha=1.0):
+        # alpha is how far the frame is between the last physics step and
+        # the next one; moving sprites are drawn interpolated by it
+        if self.headless:
+            return
+        profiler = self.profiler
+        dirty = None
         if self.state == "overworld":
             self.screen.fill(LIGHT_BLUE)
             
@@ -804,19 +2470,21 @@ class Game:
             pygame.draw.rect(self.screen, (100, 200, 100), (0, SCREEN_HEIGHT - 100, SCREEN_WIDTH, 100))
             
             # Draw title
-            font = pygame.font.SysFont(None, 48)
-            title_text = font.render("SUPER MARIO BROS 3", True, RED)
+            title_text = render_text("SUPER MARIO BROS 3", RED, 48)
             self.screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 20))
             
             # Draw world indicator
             current_world = self.overworld.nodes[self.overworld.current_node]["world"]
-            world_text = font.render(f"WORLD {current_world}", True, BLUE)
+            world_text = render_text(f"WORLD {current_world}", BLUE, 48)
             self.screen.blit(world_text, (SCREEN_WIDTH // 2 - world_text.get_width() // 2, 70))
             
+            if profiler is not None:
+                start = perf_counter()
             self.overworld.draw(self.screen)
+            if profiler is not None:
+                profiler.add("overworld_draw", start)
             
             # Draw instructions and total score
-            font = pygame.font.SysFont(None, 24)
             instructions = [
                 "Use ARROWS to move between levels",
                 "Press ENTER to start a level",
@@ -825,50 +2493,533 @@ class Game:
                 f"Lives: {self.player_lives}"
             ]
             for i, line in enumerate(instructions):
-                text = font.render(line, True, BLACK)
+                text = render_text(line, BLACK, 24)
                 self.screen.blit(text, (10, SCREEN_HEIGHT - 120 + i * 25))
+
+            if self.loading is not None:
+                progress = self.level_cache.progress(self.loading, self.campaign_seed)
+                text = render_text(f"Loading level {self.loading}... {progress:.0%}", BLACK, 24)
+                self.screen.blit(text, (SCREEN_WIDTH - 260, SCREEN_HEIGHT - 120))
+                bar = pygame.Rect(SCREEN_WIDTH - 260, SCREEN_HEIGHT - 92, 240, 12)
+                pygame.draw.rect(self.screen, BLACK, (bar.x, bar.y, int(bar.width * progress), bar.height))
+                pygame.draw.rect(self.screen, BLACK, bar, 1)
                 
         elif self.state == "level":
-            self.current_level.draw(self.screen)
+            if profiler is not None:
+                start = perf_counter()
+            self.current_level.show_clouds = not self.low_quality
+            if self.dirty_rects:
+                dirty = self.current_level.draw_dirty(self.screen, alpha)
+            else:
+                self.current_level.draw(self.screen, alpha)
+            if profiler is not None:
+                profiler.add("level_draw", start)
             
         elif self.state == "game_over":
             self.screen.fill(BLACK)
-            font = pygame.font.SysFont(None, 72)
-            game_over_text = font.render("GAME OVER", True, RED)
+            game_over_text = render_text("GAME OVER", RED, 72)
             self.screen.blit(game_over_text, (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2, SCREEN_HEIGHT // 2 - 50))
             
-            font = pygame.font.SysFont(None, 36)
-            score_text = font.render(f"Final Score: {self.total_score}", True, WHITE)
+            score_text = render_text(f"Final Score: {self.total_score}", WHITE, 36)
             self.screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, SCREEN_HEIGHT // 2 + 50))
             
-            restart_text = font.render("Press R to Restart or Q to Quit", True, WHITE)
+            restart_text = render_text("Press R to Restart or Q to Quit", WHITE, 36)
             self.screen.blit(restart_text, (SCREEN_WIDTH // 2 - restart_text.get_width() // 2, SCREEN_HEIGHT // 2 + 100))
             
         elif self.state == "victory":
             self.screen.fill((0, 100, 0))
-            font = pygame.font.SysFont(None, 72)
-            victory_text = font.render("VICTORY!", True, YELLOW)
+            victory_text = render_text("VICTORY!", YELLOW, 72)
             self.screen.blit(victory_text, (SCREEN_WIDTH // 2 - victory_text.get_width() // 2, SCREEN_HEIGHT // 2 - 50))
             
-            font = pygame.font.SysFont(None, 36)
-            score_text = font.render(f"Final Score: {self.total_score}", True, WHITE)
+            score_text = render_text(f"Final Score: {self.total_score}", WHITE, 36)
             self.screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, SCREEN_HEIGHT // 2 + 50))
             
-            restart_text = font.render("Press R to Play Again or Q to Quit", True, WHITE)
+            restart_text = render_text("Press R to Play Again or Q to Quit", WHITE, 36)
             self.screen.blit(restart_text, (SCREEN_WIDTH // 2 - restart_text.get_width() // 2, SCREEN_HEIGHT // 2 + 100))
-            
-        pygame.display.flip()
+
+        if profiler is not None:
+            overlay = profiler.draw_overlay(self.screen)
+            if dirty is not None:
+                dirty.append(overlay)
+            start = perf_counter()
+        if dirty is not None:
+            pygame.display.update(dirty)
+        else:
+            pygame.display.flip()
+        if profiler is not None:
+            profiler.add("present", start)
     
+    def adapt_quality(self, seconds):
+        # Drop the clouds while the smoothed frame work runs over budget and
+        # bring them back once there is room again
+        load = seconds * FPS
+        self.frame_load += (load - self.frame_load) * FRAME_LOAD_SMOOTHING
+        if self.frame_load > QUALITY_DROP_LOAD:
+            self.low_quality = True
+        elif self.frame_load < QUALITY_RESTORE_LOAD:
+            self.low_quality = False
+
     def run(self):
+        # Fixed-timestep loop: frames are drawn at up to FPS, while the time
+        # they take is paid back in whole physics steps from an accumulator.
+        # After MAX_CATCH_UP_STEPS in one frame the rest is dropped, so an
+        # overloaded machine slows the game down instead of stalling.
+        profiler = self.profiler
+        step = 1 / self.physics_rate
+        accumulator = 0.0
+        previous = first_frame = perf_counter()
         while self.running:
             self.clock.tick(FPS)
+            now = perf_counter()
+            accumulator += now - previous
+            previous = now
+            if profiler is not None:
+                start = profiler.begin_frame()
             self.handle_events()
-            self.update()
-            self.draw()
-        
+            if profiler is not None:
+                profiler.add("events", start)
+            steps = 0
+            while accumulator >= step:
+                if steps == MAX_CATCH_UP_STEPS:
+                    accumulator = 0.0
+                    break
+                self.update()
+                accumulator -= step
+                steps += 1
+            self.draw(accumulator / step)
+            if profiler is not None:
+                profiler.count("physics_steps", steps)
+                profiler.end_frame()
+            self.adapt_quality(perf_counter() - now)
+            if first_frame is not None:
+                # Includes loading the fonts, which happens on first use
+                self.startup_phase("first_frame", first_frame)
+                first_frame = None
+                if self.report_startup:
+                    self.print_startup()
+                    self.running = False
+
+        if self.recorder is not None:
+            self.recorder.save(self.replay_path)
+        if self.trace_path:
+            self.profiler.export(self.trace_path)
         pygame.quit()
         sys.exit()
 
+def best_time(function, repeats=BENCH_REPEATS):
+    # Best wall time over several runs, the least noisy estimate
+    best = None
+    for _ in range(repeats):
+        start = perf_counter()
+        function()
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_inputs(count):
+    # Fixed pseudo-random input script so every run simulates the same ticks
+    rng = random.Random(BENCH_SEED)
+    choices = (INPUT_RIGHT, INPUT_RIGHT | INPUT_JUMP, INPUT_LEFT, INPUT_LEFT | INPUT_JUMP, 0)
+    return [rng.choice(choices) for _ in range(count)]
+
+def bench_levels(results):
+    inputs = bench_inputs(BENCH_TICKS)
+    for level_number in range(1, 9):
+        build = lambda: Level(level_number, 3, campaign_seed=BENCH_SEED)
+        results[f"level_build_ms/{level_number}"] = best_time(build) * 1000
+
+        # Enough lives that the script never ends in a game over
+        level = Level(level_number, 10 ** 6, campaign_seed=BENCH_SEED)
+        start_state = level.snapshot()
+
+        def play():
+            level.restore(start_state)
+            for inputs_this_tick in inputs:
+                if level.step(inputs_this_tick) != "playing":
+                    level.restore(start_state)
+
+        results[f"level_ticks_per_sec/{level_number}"] = BENCH_TICKS / best_time(play)
+
+def bench_collisions(results):
+    # Player.update against levels of growing size but constant density
+    inputs = bench_inputs(BENCH_TICKS)
+    for count in BENCH_PLATFORM_COUNTS:
+        rng = random.Random(BENCH_SEED)
+        platforms = [Platform(0, SCREEN_HEIGHT - 40, SCREEN_WIDTH, 40)]
+        for _ in range(count):
+            platforms.append(Platform(rng.randrange(0, count * 80), rng.randrange(100, SCREEN_HEIGHT - 60),
+                                      rng.choice((50, 100, 150)), 20))
+        grid = SpatialGrid(platforms)
+        player = Player(100, 300)
+
+        def play():
+            player.reset_position()
+            for inputs_this_tick in inputs:
+                if inputs_this_tick & INPUT_JUMP:
+                    player.jump()
+                if inputs_this_tick & INPUT_RIGHT:
+                    player.move_right()
+                elif inputs_this_tick & INPUT_LEFT:
+                    player.move_left()
+                else:
+                    player.stop()
+                player.update(grid)
+
+        results[f"player_update_us/platforms={count}"] = best_time(play) / BENCH_TICKS * 1e6
+
+def bench_rendering(results):
+    # Frame times against the dummy SDL video driver
+    if os.environ.get("SDL_VIDEODRIVER") != "dummy":
+        pygame.display.quit()
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    init_display()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    inputs = bench_inputs(BENCH_FRAMES)
+    for level_number in range(1, 9):
+        for mode in ("draw", "draw_dirty"):
+            level = Level(level_number, 10 ** 6, campaign_seed=BENCH_SEED)
+            draw = getattr(level, mode)
+            draw(screen)  # Warm the surface caches and static layers
+            elapsed = 0.0
+            for inputs_this_tick in inputs:
+                level.step(inputs_this_tick)
+                start = perf_counter()
+                draw(screen)
+                elapsed += perf_counter() - start
+            results[f"level_{mode}_ms/{level_number}"] = elapsed / BENCH_FRAMES * 1000
+
+    overworld = OverworldMap()
+    overworld.unlocked_nodes = set(range(len(overworld.nodes)))
+    overworld.invalidate()
+    overworld.draw(screen)
+    draw = lambda: [overworld.draw(screen) for _ in range(BENCH_FRAMES)]
+    results["overworld_draw_ms"] = best_time(draw) / BENCH_FRAMES * 1000
+
+def run_benchmarks():
+    results = {}
+    bench_levels(results)
+    bench_collisions(results)
+    bench_rendering(results)
+    return {
+        "meta": {"python": sys.version.split()[0], "pygame": pygame.version.ver,
+                 "platform": sys.platform, "seed": BENCH_SEED},
+        "results": results,
+    }
+
+def compare_benchmarks(results, baseline, tolerance=BENCH_TOLERANCE):
+    # Print every metric next to its baseline and return the ones that got
+    # worse by more than tolerance. Rates are better when higher, times
+    # when lower.
+    regressions = []
+    for name, value in sorted(results.items()):
+        old = baseline.get(name)
+        if not old:
+            print(f"{name:<36}{value:>12.3f}  (new)")
+            continue
+        ratio = value / old
+        worse = ratio < 1 - tolerance if "_per_sec" in name else ratio > 1 + tolerance
+        if worse:
+            regressions.append(name)
+        print(f"{name:<36}{value:>12.3f}{old:>12.3f}{ratio:>8.2f}x{'  REGRESSION' if worse else ''}")
+    return regressions
+
+def random_policy(level):
+    rng = random.Random(level.seed)
+    choices = (0, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, INPUT_RIGHT | INPUT_JUMP, INPUT_LEFT | INPUT_JUMP)
+    return lambda level: rng.choice(choices)
+
+def plan_level(level, max_nodes=PLAN_MAX_NODES, step_ticks=PLAN_STEP_TICKS, weight=PLAN_WEIGHT):
+    # Weighted A* search for an input sequence that completes the level
+    # without losing a life. Nodes are flat level snapshots replayed on one
+    # clone, each edge holds an input for step_ticks ticks, and states whose
+    # player position, fall speed and footing were already reached are
+    # pruned. The estimate counts the jumps left on the level's jump graph.
+    # Returns the per-tick inputs, or None if no plan was found in time.
+    goals = [goal.rect for goal in level.goals]
+    if not goals:
+        return None
+    goal = goals[0]
+    level = level.clone()
+    player = level.player
+    lives = player.lives
+    actions = (INPUT_RIGHT, INPUT_RIGHT | INPUT_JUMP, INPUT_LEFT, INPUT_LEFT | INPUT_JUMP, INPUT_JUMP, 0)
+
+    # Jumps needed from each platform to one the goal can be touched from,
+    # by breadth-first search backwards over the jump graph
+    platforms = [platform.rect for platform in level.platforms]
+    graph = jump_graph(platforms)
+    sources = [[] for _ in platforms]
+    for a, targets in enumerate(graph):
+        for b in targets:
+            sources[b].append(a)
+    hops = [0 if touchable_from(goal, rect) else None for rect in platforms]
+    queue = deque(index for index, count in enumerate(hops) if count == 0)
+    while queue:
+        b = queue.popleft()
+        for a in sources[b]:
+            if hops[a] is None:
+                hops[a] = hops[b] + 1
+                queue.append(a)
+    # What to head for from each platform: the goal, or the platforms one
+    # jump closer to it
+    heading = [[goal] if count == 0 else [platforms[b] for b in graph[a] if hops[b] == count - 1]
+               for a, count in enumerate(hops)]
+
+    def estimate():
+        # Jumps left from the platform the player stands on or falls onto,
+        # plus the ticks needed to get horizontally under what to head for
+        rect = player.rect
+        support = None
+        for index, platform in enumerate(platforms):
+            if platform.top >= rect.bottom and platform.left < rect.right and platform.right > rect.left:
+                if support is None or platform.top < platforms[support].top:
+                    support = index
+        if support is None or hops[support] is None:
+            return len(platforms) * PLAN_HOP_TICKS * weight
+        gap = min(max(target.left - rect.right, rect.left - target.right, 0) for target in heading[support])
+        return (hops[support] * PLAN_HOP_TICKS + gap / PLAYER_SPEED) * weight
+
+    nodes = [(None, 0, 0)]  # (parent, input, ticks held)
+    seen = {(player.rect.x, player.rect.y, player.vel_y, player.on_ground)}
+    frontier = [(level.ticks + estimate(), -level.ticks, 0, level.snapshot())]
+    while frontier and max_nodes > 0:
+        max_nodes -= 1
+        node = heapq.heappop(frontier)
+        for action in actions:
+            level.restore(node[3])
+            status = "playing"
+            held = 0
+            while status == "playing" and held < step_ticks and player.lives == lives:
+                status = level.step(action)
+                held += 1
+            if player.lives < lives:
+                continue
+            key = (player.rect.x, player.rect.y, player.vel_y, player.on_ground)
+            if status == "playing" and key in seen:
+                continue
+            seen.add(key)
+            nodes.append((node[2], action, held))
+            if status == "completed":
+                inputs = []
+                index = len(nodes) - 1
+                while index:
+                    index, action, held = nodes[index]
+                    inputs.extend([action] * held)
+                inputs.reverse()
+                return inputs
+            heapq.heappush(frontier, (level.ticks + estimate(), -level.ticks, len(nodes) - 1, level.snapshot()))
+    return None
+
+def search_policy(level):
+    # Follow a planned route, standing still if planning failed
+    inputs = plan_level(level) or ()
+    return lambda level: inputs[level.ticks] if level.ticks < len(inputs) else 0
+
+# Bot policies for batch playthroughs. Each factory takes a fresh level and
+# returns a function choosing the input vector for the next tick.
+BOT_POLICIES = {
+    "idle": lambda level: lambda level: 0,
+    "right": lambda level: lambda level: INPUT_RIGHT,
+    "hop": lambda level: lambda level: INPUT_RIGHT | INPUT_JUMP,
+    "random": random_policy,
+    "search": search_policy,
+}
+# Policies that replay per-tick inputs, which only line up with dt = 1
+TICK_POLICIES = {"search"}
+
+def run_playthrough(job):
+    # Play one level headless for the batch runner. job is (level number,
+    # campaign seed, policy, max ticks, ticks per physics step), where policy
+    # names a bot policy or is a (name, inputs) input script. Runs in worker
+    # processes, so it only takes and returns plain data.
+    level_number, campaign_seed, policy, max_ticks, dt = job
+    if dt < 1:
+        raise ValueError("dt must be at least 1")
+    if dt != 1 and (not isinstance(policy, str) or policy in TICK_POLICIES):
+        raise ValueError("input scripts and search plans are per tick and need dt=1")
+    level = Level(level_number, 3, campaign_seed=campaign_seed)
+    if isinstance(policy, str):
+        name = policy
+        choose = BOT_POLICIES[policy](level)
+        limit = max_ticks
+    else:
+        name, script = policy
+        choose = lambda level: script[level.ticks]
+        limit = min(max_ticks, len(script))
+    status = "playing"
+    while status == "playing" and level.ticks < limit:
+        status = level.step(choose(level), dt)
+    return {"level": level_number, "seed": campaign_seed, "policy": name,
+            "result": "timeout" if status == "playing" else status,
+            "score": level.score, "lives": level.player.lives, "ticks": level.ticks}
+
+def run_batch(jobs, workers=None):
+    # Spread playthroughs over worker processes, keeping job order. Imported
+    # here so that only batch runs pay for loading multiprocessing.
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_playthrough, jobs, chunksize=chunksize))
+
+def summarize_batch(runs):
+    # Aggregate playthrough results per (level, policy)
+    groups = OrderedDict()
+    for run in sorted(runs, key=lambda run: (run["level"], run["policy"])):
+        groups.setdefault((run["level"], run["policy"]), []).append(run)
+    summary = []
+    for (level_number, policy), group in groups.items():
+        completed = [run for run in group if run["result"] == "completed"]
+        entry = {"level": level_number, "policy": policy, "runs": len(group)}
+        for result in PLAYTHROUGH_RESULTS:
+            entry[result] = sum(run["result"] == result for run in group)
+        entry["mean_score"] = sum(run["score"] for run in group) / len(group)
+        entry["mean_lives"] = sum(run["lives"] for run in group) / len(group)
+        entry["mean_ticks_to_complete"] = (
+            sum(run["ticks"] for run in completed) / len(completed) if completed else None)
+        summary.append(entry)
+    return summary
+
+def print_batch_summary(summary):
+    print(f"{'level':>5} {'policy':<12}{'runs':>6}{'done':>6}{'dead':>6}{'timeout':>8}"
+          f"{'score':>9}{'lives':>7}{'ticks':>8}")
+    for entry in summary:
+        ticks = entry["mean_ticks_to_complete"]
+        print(f"{entry['level']:>5} {entry['policy']:<12}{entry['runs']:>6}{entry['completed']:>6}"
+              f"{entry['game_over']:>6}{entry['timeout']:>8}{entry['mean_score']:>9.1f}"
+              f"{entry['mean_lives']:>7.2f}{'-' if ticks is None else f'{ticks:.0f}':>8}")
+
+def parse_numbers(text):
+    # "1-3,7" -> [1, 2, 3, 7]
+    numbers = []
+    for part in text.split(","):
+        low, _, high = part.partition("-")
+        numbers.extend(range(int(low), int(high or low) + 1))
+    return numbers
+
+IMPORT_FINISHED = perf_counter()
+
 if __name__ == "__main__":
-    game = Game()
+    import argparse
+    parser = argparse.ArgumentParser(description="Super Mario Bros 3-like Game")
+    parser.add_argument("--seed", type=int, help="campaign seed for reproducible levels")
+    parser.add_argument("--record", metavar="PATH", help="record a replay of this session")
+    parser.add_argument("--replay", metavar="PATH", help="fast-forward a replay headless and report the result")
+    parser.add_argument("--profile", action="store_true", help="show a frame-time profiler overlay")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="repaint only the changed parts of the screen inside levels")
+    parser.add_argument("--trace", metavar="PATH", help="profile and write a per-frame trace (.csv or .json)")
+    parser.add_argument("--endless", action="store_true", help="play an endless procedurally generated level")
+    parser.add_argument("--bench", metavar="PATH", help="run the benchmark suite and save results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="compare benchmark results against a saved run")
+    parser.add_argument("--physics-rate", type=int, default=PHYSICS_RATE,
+                        help=f"physics steps per second; must divide {FPS} (default: {PHYSICS_RATE})")
+    parser.add_argument("--startup", action="store_true",
+                        help="print a startup-time breakdown after the first frame and exit")
+    batch = parser.add_argument_group("batch playthroughs")
+    batch.add_argument("--batch", action="store_true", help="play levels headless across worker processes")
+    batch.add_argument("--levels", default="1-8", help="levels to play, e.g. 1-8 or 2,5 (default: 1-8)")
+    batch.add_argument("--seeds", default="0-99", help="campaign seeds to play, e.g. 0-999 (default: 0-99)")
+    batch.add_argument("--policy", action="append", choices=sorted(BOT_POLICIES),
+                       help="bot policy to play with; repeatable (default: hop)")
+    batch.add_argument("--script", action="append", metavar="PATH",
+                       help="JSON list of per-tick input vectors to play; repeatable")
+    batch.add_argument("--max-ticks", type=int, default=PLAYTHROUGH_MAX_TICKS, help="tick limit per run")
+    batch.add_argument("--dt", type=int, default=1, help="ticks per physics step (default: 1)")
+    batch.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    batch.add_argument("--report", metavar="PATH", help="write every run and the summary as JSON")
+    analyze = parser.add_argument_group("level analysis")
+    analyze.add_argument("--analyze", action="store_true",
+                         help="check that the goal and coins of --levels x --seeds are reachable")
+    analyze.add_argument("--level-file", action="append", metavar="PATH",
+                         help="analyze a level file instead of the builtin levels; repeatable")
+    analyze.add_argument("--solve", metavar="DIR",
+                         help="search a route through --levels x --seeds and save each as a --script")
+    args = parser.parse_args()
+    if args.seed is not None and not 0 <= args.seed < REPLAY_SEED_LIMIT:
+        parser.error(f"--seed must be between 0 and {REPLAY_SEED_LIMIT - 1}")
+    if args.endless and args.record:
+        parser.error("--record is not supported with --endless")
+    if args.dt < 1:
+        parser.error("--dt must be at least 1")
+    if args.dt != 1 and (args.script or TICK_POLICIES.intersection(args.policy or ())):
+        parser.error("--dt must be 1 with --script or per-tick policies (" + ", ".join(sorted(TICK_POLICIES)) + ")")
+    if args.physics_rate <= 0 or FPS % args.physics_rate:
+        parser.error(f"--physics-rate must divide {FPS}")
+    if args.record and args.physics_rate != FPS:
+        parser.error(f"--record needs --physics-rate {FPS}")
+
+    if args.bench or args.baseline:
+        report = run_benchmarks()
+        if args.bench:
+            with open(args.bench, "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+            sys.exit(1 if compare_benchmarks(report["results"], baseline) else 0)
+        compare_benchmarks(report["results"], {})
+        sys.exit()
+
+    if args.batch:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"  # Workers never open a window
+        policies = list(args.policy or ([] if args.script else ["hop"]))
+        for path in args.script or []:
+            with open(path) as f:
+                policies.append((os.path.basename(path), tuple(json.load(f))))
+        jobs = [(level_number, seed, policy, args.max_ticks, args.dt) for level_number in parse_numbers(args.levels)
+                for seed in parse_numbers(args.seeds) for policy in policies]
+        runs = run_batch(jobs, args.workers)
+        summary = summarize_batch(runs)
+        print_batch_summary(summary)
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump({"summary": summary, "runs": runs}, f, indent=1)
+        sys.exit()
+
+    if args.analyze:
+        start = perf_counter()
+        sources = [(0, path) for path in args.level_file or []]
+        sources = sources or [(level_number, None) for level_number in parse_numbers(args.levels)]
+        seeds = parse_numbers(args.seeds)
+        reports = [analyze_level(Level(level_number, 3, level_file=path, campaign_seed=seed))
+                   for level_number, path in sources for seed in seeds]
+        elapsed = perf_counter() - start
+        for i, (level_number, path) in enumerate(sources):
+            group = reports[i * len(seeds):(i + 1) * len(seeds)]
+            coins = sum(report["coins"] for report in group)
+            print(f"{path or f'level {level_number}'}: goal reachable in "
+                  f"{sum(report['goal'] is not False for report in group)}/{len(group)} seeds, "
+                  f"{sum(len(report['unreachable_coins']) for report in group)}/{coins} coins unreachable, "
+                  f"{sum(len(report['embedded_coins']) for report in group)} inside platforms")
+        print(f"{len(reports)} levels in {elapsed:.2f}s ({len(reports) / elapsed:.0f}/s)")
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(reports, f, indent=1)
+        sys.exit()
+
+    if args.solve:
+        os.makedirs(args.solve, exist_ok=True)
+        for level_number in parse_numbers(args.levels):
+            for seed in parse_numbers(args.seeds):
+                start = perf_counter()
+                inputs = plan_level(Level(level_number, 3, campaign_seed=seed))
+                elapsed = perf_counter() - start
+                if inputs is None:
+                    print(f"level {level_number} seed {seed}: no route found ({elapsed:.2f}s)")
+                    continue
+                with open(os.path.join(args.solve, f"level{level_number}-seed{seed}.json"), "w") as f:
+                    json.dump(inputs, f)
+                print(f"level {level_number} seed {seed}: {len(inputs)} ticks ({elapsed:.2f}s)")
+        sys.exit()
+
+    if args.replay:
+        with open(args.replay, "rb") as f:
+            game = ReplayPlayer(f.read()).run()
+        print(f"state={game.state} score={game.total_score} lives={game.player_lives}")
+        sys.exit()
+
+    game = Game(dirty_rects=args.dirty_rects, campaign_seed=args.seed, replay_path=args.record,
+                profile=args.profile, trace_path=args.trace, endless=args.endless,
+                report_startup=args.startup, physics_rate=args.physics_rate)
     game.run()